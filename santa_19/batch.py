@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import multiprocessing
+import resource
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Collection, Dict, List, Mapping, Optional
+
+from santa_19.config import SolverConfig
+from santa_19.deadline import Deadline, cancel_on_signals
+from santa_19.events import EventStream
+from santa_19.inputs import Family, families_per_day, parse_csv
+from santa_19.parameters import (
+    DAYS,
+    MAX_OCCUPANCY,
+    MIN_OCCUPANCY,
+    Capacity,
+    horizon,
+)
+from santa_19.result import evaluate, write_solution
+from santa_19.solution import is_feasible
+from santa_19.solver import solve
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = frozenset({"done", "infeasible"})
+
+# Set in the main process when the batch is interrupted, inherited by the
+# workers.
+_stop: Optional[multiprocessing.synchronize.Event] = None
+
+
+@dataclass(frozen=True)
+class BatchJob:
+    name: str
+    data: str
+    config: Mapping[str, Any] = field(default_factory=dict)
+    time_limit: Optional[float] = None
+    days: int = len(DAYS)
+    min_occupancy: int = MIN_OCCUPANCY
+    max_occupancy: int = MAX_OCCUPANCY
+
+    @staticmethod
+    def parse(entry: Mapping[str, Any]) -> BatchJob:
+        unknown = set(entry.keys()).difference(BatchJob.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"Unknown manifest fields: {sorted(unknown)}")
+        return BatchJob(**entry)
+
+
+@dataclass(frozen=True)
+class JobResult:
+    name: str
+    data: str
+    status: str
+    seconds: float
+    preference_cost: Optional[float] = None
+    accounting_cost: Optional[float] = None
+    total_cost: Optional[float] = None
+    solution_file: Optional[str] = None
+
+
+def read_manifest(p: Path) -> List[BatchJob]:
+    with p.open("rt") as rfile:
+        jobs = [BatchJob.parse(entry) for entry in json.load(rfile)]
+
+    names = [job.name for job in jobs]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate job names in manifest: {duplicates}")
+    return jobs
+
+
+def read_state(p: Path) -> Dict[str, JobResult]:
+    if not p.exists():
+        return {}
+    lines = p.read_text().splitlines(keepends=True)
+    state = {}
+    for i, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            result = JobResult(**json.loads(line))
+        except json.JSONDecodeError:
+            if i < len(lines) - 1:
+                raise
+            # A process killed while appending leaves a truncated last
+            # line; drop it so the next append starts on a line of its own.
+            logger.warning(f"Dropping truncated last line of {p}")
+            with p.open("r+b") as file:
+                file.truncate(sum(len(x.encode()) for x in lines[:i]))
+            break
+        state[result.name] = result
+    else:
+        if lines and not lines[-1].endswith("\n"):
+            # Killed right before the newline.
+            with p.open("at") as wfile:
+                wfile.write("\n")
+    return state
+
+
+def _append_state(p: Path, result: JobResult) -> None:
+    with p.open("at") as wfile:
+        wfile.write(json.dumps(asdict(result)) + "\n")
+
+
+def write_summary(p: Path, results: Collection[JobResult]) -> None:
+    with open(p, "w", newline="") as file:
+        writer = csv.DictWriter(
+            file, fieldnames=list(JobResult.__dataclass_fields__)
+        )
+        writer.writeheader()
+        for result in sorted(results, key=lambda r: r.name):
+            writer.writerow(asdict(result))
+
+
+class _BatchDeadline(Deadline):
+    # Expires with its own time limit or as soon as the batch is
+    # interrupted; signals sent to the main process only, e.g. by a
+    # scheduler, do not reach the workers.
+    def __init__(
+        self,
+        seconds: Optional[float],
+        stop: Optional[multiprocessing.synchronize.Event],
+    ):
+        super().__init__(seconds)
+        self.stop = stop
+
+    def cancel(self) -> None:
+        super().cancel()
+        if self.stop is not None:
+            self.stop.set()
+
+    def remaining(self) -> Optional[float]:
+        if not self.cancelled and self.stop is not None and self.stop.is_set():
+            self.cancel()
+        return super().remaining()
+
+
+def _init_worker(
+    max_bytes: Optional[int], stop: multiprocessing.synchronize.Event
+) -> None:
+    global _stop
+    _stop = stop
+    if max_bytes is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+
+def _run_job(
+    job: BatchJob, output_dir: Path, events_file: Optional[Path]
+) -> JobResult:
+    start = time.perf_counter()
+    deadline = _BatchDeadline(job.time_limit, _stop)
+    if deadline.expired():
+        # Already handed to the worker when the batch was interrupted.
+        return JobResult(job.name, job.data, "stopped", 0.0)
+    days = horizon(job.days)
+    try:
+        capacity = Capacity(job.min_occupancy, job.max_occupancy)
+        families = list(parse_csv(Path(job.data), Family.parse))
+        family_index = {f.id: f for f in families}
+        with cancel_on_signals(deadline):
+            solution = solve(
+                families,
+                families_per_day(families, days),
+                family_index,
+                days,
+                SolverConfig(**job.config),
+                EventStream(events_file, job.name),
+                deadline,
+                capacity,
+            )
+    except Exception:
+        logger.exception(f"Job {job.name} failed")
+        return JobResult(
+            job.name, job.data, "failed", time.perf_counter() - start
+        )
+    seconds = time.perf_counter() - start
+
+    if not is_feasible(solution, family_index, capacity):
+        return JobResult(job.name, job.data, "infeasible", seconds)
+
+    result = evaluate(solution, family_index, days)
+    solution_file = write_solution(solution, output_dir / f"{job.name}.csv")
+    return JobResult(
+        name=job.name,
+        data=job.data,
+        # Jobs interrupted by a signal keep their solution but are retried
+        # when the batch is restarted.
+        status="stopped" if deadline.cancelled else "done",
+        seconds=seconds,
+        preference_cost=result.preference_cost,
+        accounting_cost=result.accounting_cost,
+        total_cost=result.total_cost(),
+        solution_file=str(solution_file),
+    )
+
+
+def run_batch(
+    jobs: Collection[BatchJob],
+    output_dir: Path,
+    workers: int,
+    memory_limit: Optional[int] = None,
+    events_file: Optional[Path] = None,
+) -> List[JobResult]:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state_file = output_dir / "state.jsonl"
+    state = read_state(state_file)
+
+    pending = [
+        job
+        for job in jobs
+        if job.name not in state
+        or state[job.name].status not in FINISHED_STATUSES
+    ]
+    logger.info(
+        f"{len(jobs) - len(pending)} of {len(jobs)} jobs already finished, "
+        f"running {len(pending)} on {workers} workers"
+    )
+
+    stop = multiprocessing.Event()
+    interrupted = _BatchDeadline(None, stop)
+    with cancel_on_signals(interrupted), ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(memory_limit // workers if memory_limit else None, stop),
+    ) as pool:
+        futures = {
+            pool.submit(_run_job, job, output_dir, events_file): job
+            for job in pending
+        }
+        not_done = set(futures)
+        while not_done:
+            done, not_done = wait(
+                not_done, timeout=0.5, return_when=FIRST_COMPLETED
+            )
+            if interrupted.cancelled:
+                # Running jobs see the stop event and return their best
+                # solution; jobs that did not start stay queued for a
+                # restart.
+                for queued in not_done:
+                    queued.cancel()
+            for future in done:
+                if future.cancelled():
+                    continue
+                try:
+                    result = future.result()
+                except Exception:
+                    # The worker died, e.g. killed for exceeding its memory.
+                    job = futures[future]
+                    logger.exception(f"Job {job.name} crashed")
+                    result = JobResult(job.name, job.data, "failed", 0.0)
+                logger.info(
+                    f"Job {result.name} {result.status} in "
+                    f"{result.seconds:.1f}s (cost: {result.total_cost})"
+                )
+                _append_state(state_file, result)
+                state[result.name] = result
+
+    results = [state[job.name] for job in jobs if job.name in state]
+    write_summary(output_dir / "summary.csv", results)
+    return results
@@ -1,30 +1,50 @@
 import logging
-from collections import defaultdict
-from itertools import repeat
+import os
+from dataclasses import replace
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Mapping
+from typing import Callable, Collection, Optional, Sequence, Tuple
 
 import click
-from plotly import graph_objects as go
 
+from .batch import read_manifest, run_batch
+from .config import DEFAULT_CONFIG, ENGINES
+from .deadline import Deadline, cancel_on_signals
+from .events import EventStream, ProgressEvent, follow, read_events
 from .inputs import (
-    ChoiceIndex,
     Day,
     Family,
-    FamilyID,
-    choice,
+    diff_families,
     families_per_day,
+    generate_families,
     parse_assignments,
     parse_csv,
+    write_families,
 )
+from .parameters import (
+    DAYS,
+    DEFAULT_CAPACITY,
+    MAX_OCCUPANCY,
+    MIN_OCCUPANCY,
+    Capacity,
+    horizon,
+)
+from .portfolio import DEFAULT_PORTFOLIO, PORTFOLIO_ENGINES, run_portfolio
+from .report import build_report, summarize_solution, write_report
 from .result import evaluate, write_solution
 from .solution import Solution, is_feasible
-from .solver import MAX_OCCUPANCY, MIN_OCCUPANCY, solve
+from .solver import reoptimize, solve
+from .tuning import (
+    fastest_reaching,
+    grid_configs,
+    random_configs,
+    summarize,
+    tune,
+)
+from .vectorized import FamilyArrays
 
 # from .typing import Solution
 
-DAYS = list(range(1, 101))
-
 logger = logging.getLogger(__name__)
 
 logging.basicConfig(
@@ -38,100 +58,532 @@ def cli():
     "Santa19 Command line interface"
 
 
+def _problem_options(command: Callable) -> Callable:
+    for option in reversed(
+        [
+            click.option(
+                "--days",
+                default=len(DAYS),
+                show_default=True,
+                help="Length of the planning horizon.",
+            ),
+            click.option(
+                "--min-occupancy",
+                default=MIN_OCCUPANCY,
+                show_default=True,
+            ),
+            click.option(
+                "--max-occupancy",
+                default=MAX_OCCUPANCY,
+                show_default=True,
+            ),
+        ]
+    ):
+        command = option(command)
+    return command
+
+
+def _capacity(min_occupancy: int, max_occupancy: int) -> Capacity:
+    try:
+        return Capacity(min_occupancy, max_occupancy)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--min-occupancy")
+
+
 @cli.command()
 @click.option(
-    "--p/--np", default=False, help="Control to plot the solution by default."
+    "--p/--np",
+    default=False,
+    help="Control to write an HTML report of the solution by default.",
+)
+@click.option(
+    "--data",
+    default="data/family_data.csv",
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@_problem_options
+@click.option(
+    "--events",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Append progress events as JSON lines to this file.",
+)
+@click.option("--run-name", default="", help="Run name used in events.")
+@click.option(
+    "--time-limit",
+    type=float,
+    default=None,
+    help="Seconds after which the best solution found so far is written.",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default=DEFAULT_CONFIG.engine,
+    show_default=True,
+    help="Exact engine run after the heuristics.",
 )
-def run(p: bool) -> None:
-    families = list(parse_csv(Path("data/family_data.csv"), Family.parse))
+def run(
+    p: bool,
+    data: str,
+    days: int,
+    min_occupancy: int,
+    max_occupancy: int,
+    events: Optional[str],
+    run_name: str,
+    time_limit: Optional[float],
+    engine: str,
+) -> None:
+    planning_days = horizon(days)
+    capacity = _capacity(min_occupancy, max_occupancy)
+    families = list(parse_csv(Path(data), Family.parse))
     family_index = {f.id: f for f in families}
-    family_day_index = families_per_day(families, DAYS)
+    family_day_index = families_per_day(families, planning_days)
 
-    solution = solve(families, family_day_index, family_index, DAYS)
+    with cancel_on_signals(Deadline(time_limit)) as deadline:
+        solution = solve(
+            families,
+            family_day_index,
+            family_index,
+            planning_days,
+            config=replace(DEFAULT_CONFIG, engine=engine),
+            events=EventStream(Path(events) if events else None, run_name),
+            deadline=deadline,
+            capacity=capacity,
+        )
 
     if is_feasible(
         solution=solution,
         families=family_index,
+        capacity=capacity,
     ):
-        result = evaluate(solution, family_index, DAYS)
+        result = evaluate(solution, family_index, planning_days)
         logger.info(
             f"Solution with total cost: {result.total_cost()} "
             f"(preference: {result.preference_cost}, accounting:{result.accounting_cost})"  # noqa: E501
         )
-        file_name = write_solution(solution)
+        file_name = Path(write_solution(solution))
         if p:
-            _plot(solution, family_index, file_name)
+            _report(
+                [file_name],
+                families,
+                planning_days,
+                capacity,
+                file_name.with_suffix(".html"),
+            )
     else:
         logger.error("Solution infeasible")
 
 
-def _plot(
-    solution: Solution,
-    family_index: Mapping[FamilyID, Family],
-    solution_file: str,
+@cli.command("reoptimize")
+@click.option(
+    "--base",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Solution file to start from.",
+)
+@click.option(
+    "--data",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Updated family data.",
+)
+@click.option(
+    "--base-data",
+    default="data/family_data.csv",
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Family data the base solution was computed for.",
+)
+@_problem_options
+@click.option(
+    "--time-limit",
+    type=float,
+    default=None,
+    help="Seconds after which the best solution found so far is written.",
+)
+def reoptimize_command(
+    base: str,
+    data: str,
+    base_data: str,
+    days: int,
+    min_occupancy: int,
+    max_occupancy: int,
+    time_limit: Optional[float],
 ) -> None:
-    if not is_feasible(solution, family_index):
-        logger.error("Infeasible solution.")
+    planning_days = horizon(days)
+    capacity = _capacity(min_occupancy, max_occupancy)
+    base_family_index = {
+        f.id: f for f in parse_csv(Path(base_data), Family.parse)
+    }
+    families = list(parse_csv(Path(data), Family.parse))
+    family_index = {f.id: f for f in families}
+    family_day_index = families_per_day(families, planning_days)
 
-    targets: Dict[ChoiceIndex, Dict[Day, int]] = {}
-    for choice_level in range(0, 11):
-        targets[choice_level] = defaultdict(int)
+    diff = diff_families(base_family_index, family_index)
+    logger.info(
+        f"Families added: {len(diff.added)}, removed: {len(diff.removed)}, "
+        f"changed: {len(diff.changed)}"
+    )
+    base_solution = Solution.from_assignments(
+        parse_assignments(Path(base)), planning_days, base_family_index
+    )
 
-    for family_id, assigned_day in solution.assignments.items():
-        choice_level = choice(
-            family_index[family_id].choice_index, assigned_day
+    with cancel_on_signals(Deadline(time_limit)) as deadline:
+        solution = reoptimize(
+            base_solution,
+            base_family_index,
+            diff,
+            families,
+            family_day_index,
+            family_index,
+            planning_days,
+            deadline,
+            capacity,
         )
-        target = targets[choice_level]
-        target[assigned_day] = (
-            target.get(assigned_day, 0)
-            + family_index[family_id].number_of_members
+
+    if is_feasible(
+        solution=solution,
+        families=family_index,
+        capacity=capacity,
+    ):
+        result = evaluate(solution, family_index, planning_days)
+        logger.info(
+            f"Solution with total cost: {result.total_cost()} "
+            f"(preference: {result.preference_cost}, accounting:{result.accounting_cost})"  # noqa: E501
         )
+        write_solution(solution)
+    else:
+        logger.error("Solution infeasible")
 
-    fig = go.Figure(
-        data=[
-            go.Bar(
-                name=f"Choice {choice_level}",
-                x=list(targets[choice_level].keys()),
-                y=list(targets[choice_level].values()),
-            )
-            for choice_level in range(0, 11)
-        ],
+
+@cli.command("portfolio")
+@click.option(
+    "--data",
+    default="data/family_data.csv",
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@_problem_options
+@click.option(
+    "--engine",
+    "engines",
+    multiple=True,
+    type=click.Choice(PORTFOLIO_ENGINES),
+    default=DEFAULT_PORTFOLIO,
+    show_default=True,
+    help="Engine to run in its own process, may be repeated.",
+)
+@click.option(
+    "--time-limit",
+    type=float,
+    default=None,
+    help="Seconds after which the best solution found so far is written.",
+)
+@click.option(
+    "--target",
+    type=float,
+    default=None,
+    help="Stop all engines once one of them reaches this cost.",
+)
+@click.option(
+    "--events",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Append progress events of every engine to this file.",
+)
+@click.option("--run-name", default="portfolio", show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def portfolio_command(
+    data: str,
+    days: int,
+    min_occupancy: int,
+    max_occupancy: int,
+    engines: Tuple[str, ...],
+    time_limit: Optional[float],
+    target: Optional[float],
+    events: Optional[str],
+    run_name: str,
+    seed: int,
+) -> None:
+    planning_days = horizon(days)
+    capacity = _capacity(min_occupancy, max_occupancy)
+    families = list(parse_csv(Path(data), Family.parse))
+    family_index = {f.id: f for f in families}
+
+    result = run_portfolio(
+        families,
+        planning_days,
+        engines,
+        capacity,
+        time_limit,
+        target,
+        Path(events) if events else None,
+        run_name,
+        seed=seed,
     )
-    fig.add_trace(
-        go.Scatter(
-            x=DAYS,
-            y=list(repeat(MIN_OCCUPANCY, len(DAYS))),
-            mode="lines",
-            name="Min Occupancy",
+    if result.solution is None or not is_feasible(
+        solution=result.solution,
+        families=family_index,
+        capacity=capacity,
+    ):
+        logger.error("No feasible solution found")
+        return
+    logger.info(
+        f"Solution with total cost: {result.cost} found by {result.engine}"
+        + (" (optimal)" if result.proven else "")
+    )
+    write_solution(result.solution)
+
+
+@cli.command()
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("--families", "n_families", default=5000, show_default=True)
+@click.option("--days", default=len(DAYS), show_default=True)
+@click.option("--choices", "n_choices", default=10, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def generate(
+    output: str, n_families: int, days: int, n_choices: int, seed: int
+) -> None:
+    "Write a random family data file, e.g. to test larger instances."
+    write_families(
+        Path(output),
+        generate_families(n_families, horizon(days), n_choices, seed=seed),
+    )
+
+
+@cli.command("tune")
+@click.option(
+    "--instance",
+    "instances",
+    multiple=True,
+    default=["data/family_data.csv"],
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Family data to tune on, can be given multiple times.",
+)
+@_problem_options
+@click.option(
+    "--search",
+    type=click.Choice(["grid", "random"]),
+    default="random",
+    show_default=True,
+)
+@click.option(
+    "--samples",
+    default=20,
+    show_default=True,
+    help="Number of configurations for the random search.",
+)
+@click.option("--seed", default=0, show_default=True)
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Size of the process pool, defaults to the number of CPUs.",
+)
+@click.option(
+    "--target",
+    type=float,
+    default=None,
+    help="Report the fastest configuration reaching this cost.",
+)
+def tune_command(
+    instances: Tuple[str, ...],
+    days: int,
+    min_occupancy: int,
+    max_occupancy: int,
+    search: str,
+    samples: int,
+    seed: int,
+    workers: Optional[int],
+    target: Optional[float],
+) -> None:
+    configs = (
+        grid_configs() if search == "grid" else random_configs(samples, seed)
+    )
+    summaries = summarize(
+        tune(
+            configs,
+            instances,
+            workers,
+            horizon(days),
+            _capacity(min_occupancy, max_occupancy),
         )
     )
-    fig.add_trace(
-        go.Scatter(
-            x=DAYS,
-            y=list(repeat(MAX_OCCUPANCY, len(DAYS))),
-            mode="lines",
-            name="Max Occupancy",
+
+    click.echo(f"{'mean cost':>12} {'max cost':>12} {'seconds':>9}  config")
+    for summary in summaries:
+        mean_cost = (
+            "failed"
+            if summary.mean_cost is None
+            else f"{summary.mean_cost:.2f}"
         )
+        max_cost = (
+            "failed" if summary.max_cost is None else f"{summary.max_cost:.2f}"
+        )
+        click.echo(
+            f"{mean_cost:>12} {max_cost:>12} {summary.mean_seconds:>9.1f}  "
+            f"{summary.config}"
+        )
+
+    if target is not None:
+        fastest = fastest_reaching(summaries, target)
+        if fastest is None:
+            logger.warning(f"No configuration reached the target {target}")
+        else:
+            logger.info(
+                f"Fastest configuration reaching {target}: {fastest.config} "
+                f"({fastest.mean_seconds:.1f}s)"
+            )
+
+
+@cli.command("batch")
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--output-dir",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Where solutions, queue state and summary are written "
+    "[default: data/outputs/<manifest name>].",
+)
+@click.option(
+    "--workers",
+    default=os.cpu_count() or 1,
+    show_default=True,
+    help="Number of instances solved concurrently.",
+)
+@click.option(
+    "--memory-limit",
+    type=int,
+    default=None,
+    help="Memory in MB shared by all workers.",
+)
+@click.option(
+    "--events",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Append progress events of all jobs to this file.",
+)
+def batch_command(
+    manifest: str,
+    output_dir: Optional[str],
+    workers: int,
+    memory_limit: Optional[int],
+    events: Optional[str],
+) -> None:
+    results = run_batch(
+        read_manifest(Path(manifest)),
+        Path(output_dir or f"data/outputs/{Path(manifest).stem}"),
+        workers,
+        memory_limit * 1024 * 1024 if memory_limit else None,
+        Path(events) if events else None,
     )
-    result = evaluate(solution, family_index, DAYS)
-    fig.update_layout(
-        barmode="stack",
-        title=f"Total cost: {round(result.total_cost(), 2)} "
-        f"(prefc: {round(result.preference_cost, 2)}, acc.: {round(result.accounting_cost, 2)})"  # noqa: E501
-        f" | from {solution_file}",
+    for result in results:
+        click.echo(
+            f"{result.name:<24} {result.status:<10} "
+            f"{result.seconds:>9.1f}s  {result.total_cost}"
+        )
+
+
+def _format_event(event: ProgressEvent) -> str:
+    def _number(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}"
+
+    return (
+        f"{datetime.fromtimestamp(event.timestamp):%H:%M:%S} "
+        f"{event.run:<24} {event.phase:<9} "
+        f"incumbent={_number(event.incumbent):>12} "
+        f"bound={_number(event.bound):>12} "
+        f"moves/s={_number(event.moves_per_second):>12}"
     )
-    fig.show()
+
+
+@cli.command()
+@click.argument("events_file", type=click.Path(dir_okay=False))
+@click.option(
+    "--follow/--no-follow",
+    "follow_",
+    default=True,
+    help="Keep waiting for new events.",
+)
+@click.option("--run", "runs", multiple=True, help="Only show these runs.")
+def watch(events_file: str, follow_: bool, runs: Tuple[str, ...]) -> None:
+    stream = (
+        follow(Path(events_file))
+        if follow_
+        else read_events(Path(events_file))
+    )
+    for event in stream:
+        if not runs or event.run in runs:
+            click.echo(_format_event(event))
+
+
+def _report(
+    solution_files: Sequence[Path],
+    families: Collection[Family],
+    days: Sequence[Day],
+    capacity: Capacity,
+    output: Path,
+) -> None:
+    arrays = FamilyArrays.from_families(families)
+    summaries = [
+        summarize_solution(
+            p.name, parse_assignments(p), arrays, days, capacity
+        )
+        for p in solution_files
+    ]
+    write_report(build_report(summaries, days, capacity), output)
 
 
 @cli.command()
 @click.argument("solution_file")
 def plot(solution_file: str) -> None:
-    family_index = {
-        f.id: f for f in parse_csv(Path("data/family_data.csv"), Family.parse)
-    }
-    assignments = parse_assignments(Path(f"data/outputs/{solution_file}"))
-    _plot(
-        solution=Solution.from_assignments(assignments, DAYS, family_index),
-        family_index=family_index,
-        solution_file=solution_file,
+    "Write an HTML report next to a solution in data/outputs."
+    solution_path = Path(f"data/outputs/{solution_file}")
+    _report(
+        [solution_path],
+        list(parse_csv(Path("data/family_data.csv"), Family.parse)),
+        DAYS,
+        DEFAULT_CAPACITY,
+        solution_path.with_suffix(".html"),
+    )
+
+
+@cli.command()
+@click.argument(
+    "solution_files",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--data",
+    default="data/family_data.csv",
+    show_default=True,
+    type=click.Path(exists=True, dir_okay=False),
+)
+@_problem_options
+@click.option(
+    "--output",
+    default="data/outputs/report.html",
+    show_default=True,
+    type=click.Path(dir_okay=False),
+    help="HTML file, or an image (.png, .svg, ...) if kaleido is installed.",
+)
+def report(
+    solution_files: Tuple[str, ...],
+    data: str,
+    days: int,
+    min_occupancy: int,
+    max_occupancy: int,
+    output: str,
+) -> None:
+    "Compare several solutions of the same family data in one report."
+    _report(
+        [Path(p) for p in solution_files],
+        list(parse_csv(Path(data), Family.parse)),
+        horizon(days),
+        _capacity(min_occupancy, max_occupancy),
+        Path(output),
     )
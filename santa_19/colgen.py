@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import (
+    Collection,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import gurobipy as grb
+import numpy as np
+from gurobipy.gurobipy import GRB
+
+from santa_19 import gurobi
+from santa_19.costs import accounting_cost, preference_cost
+from santa_19.deadline import NO_DEADLINE, Deadline
+from santa_19.events import NO_EVENTS, EventStream
+from santa_19.incumbent import SharedIncumbent
+from santa_19.inputs import Day, Family, families_per_day
+from santa_19.parameters import DEFAULT_CAPACITY, Capacity
+from santa_19.solution import Solution
+from santa_19.typing import FamilyID
+
+logger = logging.getLogger(__name__)
+
+_EPSILON = 1e-6
+
+OccupancyPair = Tuple[int, int, Day]
+
+
+@dataclass(frozen=True)
+class Pattern:
+    day: Day
+    families: Tuple[FamilyID, ...]
+    occupancy: int
+    cost: float
+
+
+@dataclass(frozen=True)
+class ColumnGenerationResult:
+    solution: Optional[Solution]
+    lower_bound: float
+    iterations: int
+    columns: int
+
+
+class _Master:
+    def __init__(
+        self,
+        model: grb.Model,
+        family_index: Mapping[FamilyID, Family],
+        days: Sequence[Day],
+        capacity: Capacity,
+    ) -> None:
+        self.model = model
+        self.days = list(days)
+        self.occupancies = list(capacity.occupancies())
+        self.pair_costs = np.array(
+            [
+                [accounting_cost(o, o_p) for o_p in self.occupancies]
+                for o in self.occupancies
+            ]
+        )
+        self.patterns: List[Tuple[Pattern, grb.Var]] = []
+        self.pairs: Dict[OccupancyPair, grb.Var] = {}
+        self.pattern_keys: Set[Tuple[Day, Tuple[FamilyID, ...]]] = set()
+
+        model.setParam("OutputFlag", 0)
+        self.cover = {
+            family_id: model.addLConstr(grb.LinExpr(), GRB.EQUAL, 1)
+            for family_id in family_index.keys()
+        }
+        self.convexity = {
+            day: model.addLConstr(grb.LinExpr(), GRB.EQUAL, 1)
+            for day in self.days
+        }
+        # Occupancy o on day d is linked to the pairs (o, *, d) leaving it
+        # and to the pairs (*, o, d - 1) entering it.
+        self.leaving = {
+            (o, d): model.addLConstr(grb.LinExpr(), GRB.EQUAL, 0)
+            for d in self.days[:-1]
+            for o in self.occupancies
+        }
+        self.entering = {
+            (o, d): model.addLConstr(grb.LinExpr(), GRB.EQUAL, 0)
+            for d in self.days[1:]
+            for o in self.occupancies
+        }
+
+    def add_pattern(self, pattern: Pattern) -> bool:
+        key = (pattern.day, pattern.families)
+        if key in self.pattern_keys:
+            return False
+        self.pattern_keys.add(key)
+
+        constrs = [self.cover[f] for f in pattern.families]
+        constrs.append(self.convexity[pattern.day])
+        coeffs = [1.0] * len(constrs)
+        for links in (self.leaving, self.entering):
+            link = links.get((pattern.occupancy, pattern.day))
+            if link is not None:
+                constrs.append(link)
+                coeffs.append(-1.0)
+
+        # No upper bounds: they are implied by the convexity rows and would
+        # let existing columns keep negative reduced costs.
+        var = self.model.addVar(
+            lb=0.0,
+            obj=pattern.cost,
+            column=grb.Column(coeffs, constrs),
+        )
+        self.patterns.append((pattern, var))
+        return True
+
+    def add_pair(self, o: int, o_p: int, d: Day) -> bool:
+        if (o, o_p, d) in self.pairs:
+            return False
+        i, j = o - self.occupancies[0], o_p - self.occupancies[0]
+        self.pairs[(o, o_p, d)] = self.model.addVar(
+            lb=0.0,
+            obj=self.pair_costs[i, j],
+            column=grb.Column(
+                [1.0, 1.0],
+                [self.leaving[(o, d)], self.entering[(o_p, d + 1)]],
+            ),
+        )
+        return True
+
+    def duals(
+        self,
+    ) -> Tuple[
+        Dict[FamilyID, float], Dict[Day, float], np.ndarray, np.ndarray
+    ]:
+        cover = dict(
+            zip(
+                self.cover.keys(),
+                self.model.getAttr("Pi", list(self.cover.values())),
+            )
+        )
+        convexity = dict(
+            zip(
+                self.convexity.keys(),
+                self.model.getAttr("Pi", list(self.convexity.values())),
+            )
+        )
+        # Indexed by (occupancy - minimum, day); zero where no row exists.
+        shape = (len(self.occupancies), max(self.days) + 1)
+        leaving, entering = np.zeros(shape), np.zeros(shape)
+        for array, links in (
+            (leaving, self.leaving),
+            (entering, self.entering),
+        ):
+            pis = self.model.getAttr("Pi", list(links.values()))
+            for (o, d), pi in zip(links.keys(), pis):
+                array[o - self.occupancies[0], d] = pi
+        return cover, convexity, leaving, entering
+
+
+def _pattern_cost(
+    families: Collection[Family], day: Day, last_day: bool
+) -> Tuple[int, float]:
+    occupancy = sum(f.number_of_members for f in families)
+    cost = sum(
+        preference_cost(day, f.choice_index, f.number_of_members)
+        for f in families
+    )
+    if last_day:
+        cost += accounting_cost(occupancy, occupancy)
+    return occupancy, cost
+
+
+def _price_day(
+    candidates: Sequence[Family],
+    profits: np.ndarray,
+    capacity: Capacity,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Exact-weight 0/1 knapsack: best[w] is the minimum of the summed
+    # profits over subsets of candidates with exactly w members.
+    best = np.full(capacity.maximum + 1, np.inf)
+    best[0] = 0.0
+    taken = np.zeros((len(candidates), capacity.maximum + 1), dtype=bool)
+    for i, family in enumerate(candidates):
+        n = family.number_of_members
+        with_family = best[:-n] + profits[i]
+        improves = with_family < best[n:]
+        best[n:] = np.where(improves, with_family, best[n:])
+        taken[i, n:] = improves
+    return best, taken
+
+
+def _backtrack(
+    candidates: Sequence[Family], taken: np.ndarray, occupancy: int
+) -> Tuple[FamilyID, ...]:
+    chosen = []
+    for i in range(len(candidates) - 1, -1, -1):
+        if taken[i, occupancy]:
+            chosen.append(candidates[i].id)
+            occupancy -= candidates[i].number_of_members
+    return tuple(sorted(chosen))
+
+
+def _initial_patterns(
+    solution: Solution,
+    family_index: Mapping[FamilyID, Family],
+    days: Sequence[Day],
+) -> List[Pattern]:
+    per_day: Dict[Day, List[Family]] = {day: [] for day in days}
+    for family_id, day in solution.assignments.items():
+        per_day[day].append(family_index[family_id])
+    patterns = []
+    for day, families in per_day.items():
+        occupancy, cost = _pattern_cost(families, day, day == days[-1])
+        patterns.append(
+            Pattern(
+                day, tuple(sorted(f.id for f in families)), occupancy, cost
+            )
+        )
+    return patterns
+
+
+def column_generation(
+    incumbent: Solution,
+    families: Collection[Family],
+    family_index: Mapping[FamilyID, Family],
+    days: Sequence[Day],
+    max_iterations: int = 200,
+    columns_per_day: int = 3,
+    pairs_per_day: int = 50,
+    time_limit: Optional[float] = None,
+    events: EventStream = NO_EVENTS,
+    deadline: Deadline = NO_DEADLINE,
+    capacity: Capacity = DEFAULT_CAPACITY,
+    shared: Optional[SharedIncumbent] = None,
+    threads: Optional[int] = None,
+) -> ColumnGenerationResult:
+    days = list(days)
+    family_day_index = families_per_day(families, days)
+    minimum = capacity.minimum
+
+    with gurobi.model("santa-19-colgen") as model:
+        master = _Master(model, family_index, days, capacity)
+        if threads is not None:
+            model.setParam("Threads", threads)
+
+        # The incumbent's day patterns and occupancy pairs make the
+        # restricted master feasible from the start.
+        for pattern in _initial_patterns(incumbent, family_index, days):
+            master.add_pattern(pattern)
+        for d, d_next in zip(days, days[1:]):
+            master.add_pair(
+                incumbent.daily_occupancy[d],
+                incumbent.daily_occupancy[d_next],
+                d,
+            )
+        incumbent_vars = [var for _, var in master.patterns] + list(
+            master.pairs.values()
+        )
+
+        terminate = gurobi.terminate_callback(deadline)
+        lower_bound = -np.inf
+        iteration = 0
+        proven = False
+        for iteration in range(1, max_iterations + 1):
+            remaining = deadline.remaining()
+            if remaining is not None:
+                if remaining <= 0.0:
+                    break
+                model.setParam("TimeLimit", remaining)
+            model.optimize(terminate)
+            if model.status in (GRB.TIME_LIMIT, GRB.INTERRUPTED):
+                break
+            if model.status != GRB.OPTIMAL:
+                raise Exception(f"Master LP not solved: {model.status}.")
+            cover, convexity, leaving, entering = master.duals()
+
+            added = 0
+            reduced_cost_sum = 0.0
+            for day in days:
+                candidates = list(family_day_index[day])
+                profits = np.array(
+                    [
+                        preference_cost(
+                            day, f.choice_index, f.number_of_members
+                        )
+                        - cover[f.id]
+                        for f in candidates
+                    ]
+                )
+                best, taken = _price_day(candidates, profits, capacity)
+
+                occupancies = np.arange(minimum, capacity.maximum + 1)
+                reduced_costs = (
+                    best[minimum:]
+                    + leaving[:, day]
+                    + entering[:, day]
+                    - convexity[day]
+                )
+                if day == days[-1]:
+                    reduced_costs = reduced_costs + np.diag(master.pair_costs)
+                reduced_cost_sum += min(0.0, float(reduced_costs.min()))
+
+                for k in np.argsort(reduced_costs)[:columns_per_day]:
+                    if reduced_costs[k] >= -_EPSILON:
+                        break
+                    occupancy = int(occupancies[k])
+                    members = _backtrack(candidates, taken, occupancy)
+                    _, cost = _pattern_cost(
+                        [family_index[f] for f in members],
+                        day,
+                        day == days[-1],
+                    )
+                    added += master.add_pattern(
+                        Pattern(day, members, occupancy, cost)
+                    )
+
+            for d, d_next in zip(days, days[1:]):
+                pair_reduced_costs = (
+                    master.pair_costs
+                    - leaving[:, d][:, None]
+                    - entering[:, d_next][None, :]
+                )
+                negative = pair_reduced_costs < -_EPSILON
+                reduced_cost_sum += min(0.0, float(pair_reduced_costs.min()))
+                flat = np.argsort(pair_reduced_costs, axis=None)
+                for k in flat[:pairs_per_day]:
+                    i, j = np.unravel_index(k, pair_reduced_costs.shape)
+                    if not negative[i, j]:
+                        break
+                    added += master.add_pair(minimum + i, minimum + j, d)
+
+            # Lagrangian bound: every day takes exactly one pattern and
+            # exactly one occupancy pair links it to the next day.
+            lower_bound = max(lower_bound, model.ObjVal + reduced_cost_sum)
+            logger.info(
+                f"Column generation iteration {iteration}: master "
+                f"{model.ObjVal:.2f}, bound {lower_bound:.2f}, "
+                f"{len(master.patterns)} patterns, {added} new columns"
+            )
+            events.publish("colgen", incumbent=model.ObjVal, bound=lower_bound)
+            if shared is not None and lower_bound >= shared.cost() - _EPSILON:
+                # Another engine's solution is optimal already.
+                shared.prove(lower_bound, "colgen")
+                proven = True
+                break
+            if not added:
+                break
+
+        solution = (
+            None
+            if proven
+            else _solve_restricted_master(
+                master,
+                incumbent_vars,
+                family_index,
+                days,
+                time_limit,
+                deadline,
+            )
+        )
+        return ColumnGenerationResult(
+            solution=solution,
+            lower_bound=lower_bound,
+            iterations=iteration,
+            columns=len(master.patterns) + len(master.pairs),
+        )
+
+
+def _solve_restricted_master(
+    master: _Master,
+    incumbent_vars: Collection[grb.Var],
+    family_index: Mapping[FamilyID, Family],
+    days: Sequence[Day],
+    time_limit: Optional[float],
+    deadline: Deadline,
+) -> Optional[Solution]:
+    model = master.model
+    for _, var in master.patterns:
+        var.vtype = GRB.BINARY
+        var.Start = 0.0
+    for var in incumbent_vars:
+        var.Start = 1.0
+
+    remaining = deadline.remaining()
+    if remaining is not None or time_limit is not None:
+        model.setParam(
+            "TimeLimit",
+            min(t for t in (remaining, time_limit) if t is not None),
+        )
+    model.optimize(gurobi.terminate_callback(deadline))
+
+    if model.SolCount == 0:
+        logger.warning("Restricted master found no integer solution.")
+        return None
+    assignments = {
+        family_id: pattern.day
+        for pattern, var in master.patterns
+        if var.X > 0.5
+        for family_id in pattern.families
+    }
+    logger.info(
+        f"Restricted master solution: {model.ObjVal:.2f} "
+        f"(gap {model.MIPGap:.4f})"
+    )
+    return Solution.from_assignments(assignments, days, family_index)
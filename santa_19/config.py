@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from typing import Optional
+
+FAMILY_ORDERS = ("members_desc", "members_asc", "input")
+CHOICE_ORDERS = ("occupancy", "preference")
+IMPROVEMENTS = ("naive", "guided", "batch")
+ENGINES = ("mip", "colgen")
+
+
+@dataclass(frozen=True)
+class SolverConfig:
+    family_order: str = "members_desc"
+    choice_order: str = "occupancy"
+    max_improvement_passes: Optional[int] = None
+    improvement: str = "naive"
+    guided_iterations: int = 200
+    use_mip: bool = True
+    engine: str = "mip"
+    presolve: bool = True
+    reduced_cost_fixing: bool = False
+    mip_time_limit: Optional[float] = None
+    # Gurobi's default uses all cores.
+    threads: Optional[int] = None
+    warm_start: bool = True
+
+    def __post_init__(self) -> None:
+        if self.family_order not in FAMILY_ORDERS:
+            raise ValueError(f"Unknown family order: {self.family_order}")
+        if self.choice_order not in CHOICE_ORDERS:
+            raise ValueError(f"Unknown choice order: {self.choice_order}")
+        if self.improvement not in IMPROVEMENTS:
+            raise ValueError(f"Unknown improvement: {self.improvement}")
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {self.engine}")
+
+
+DEFAULT_CONFIG = SolverConfig()
@@ -1,6 +1,10 @@
-from typing import Callable, Iterable, Mapping
+import math
+from typing import Callable, Iterable, Mapping, Union, overload
+
+import numpy as np
 
 from santa_19.inputs import Family
+from santa_19.parameters import MIN_OCCUPANCY
 from santa_19.typing import (
     Assignments,
     ChoiceIndex,
@@ -102,12 +106,33 @@ def preference_cost_of_assignments(
     return preference
 
 
-def accounting_cost(occupancy: int, occupancy_next_day: int) -> float:
-    return (
-        (occupancy - 125.0)
-        / 400.0
-        * occupancy ** (0.5 + abs(occupancy - occupancy_next_day) / 50.0)
-    )
+@overload
+def accounting_cost(occupancy: int, occupancy_next_day: int) -> float: ...
+
+
+@overload
+def accounting_cost(
+    occupancy: np.ndarray, occupancy_next_day: np.ndarray
+) -> np.ndarray: ...
+
+
+def accounting_cost(
+    occupancy: Union[int, np.ndarray],
+    occupancy_next_day: Union[int, np.ndarray],
+) -> Union[float, np.ndarray]:
+    # Works on single occupancies and element-wise on arrays of them.
+    # Occupancies this far apart are never part of a sensible solution, so
+    # costs too large for a float are infinite.
+    try:
+        with np.errstate(over="ignore"):
+            return (
+                (occupancy - MIN_OCCUPANCY)
+                / 400.0
+                * occupancy
+                ** (0.5 + abs(occupancy - occupancy_next_day) / 50.0)
+            )
+    except OverflowError:
+        return math.inf
 
 
 def accounting_cost_of_daily_occupancy(
@@ -0,0 +1,56 @@
+import logging
+import signal
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    def __init__(self, seconds: Optional[float] = None) -> None:
+        self.expires_at = (
+            None if seconds is None else time.monotonic() + seconds
+        )
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def remaining(self) -> Optional[float]:
+        if self.cancelled:
+            return 0.0
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0.0
+
+
+NO_DEADLINE = Deadline()
+
+
+@contextmanager
+def cancel_on_signals(
+    deadline: Deadline,
+    signals: Sequence[signal.Signals] = (signal.SIGINT, signal.SIGTERM),
+) -> Iterator[Deadline]:
+    def handler(signum: int, frame: object) -> None:
+        if deadline.cancelled:
+            # A second signal means the user does not want to wait for the
+            # current phase to wind down.
+            raise KeyboardInterrupt
+        logger.warning(
+            f"Received {signal.Signals(signum).name}, stopping after the "
+            f"current step with the best solution found so far"
+        )
+        deadline.cancel()
+
+    previous = {s: signal.signal(s, handler) for s in signals}
+    try:
+        yield deadline
+    finally:
+        for s, previous_handler in previous.items():
+            signal.signal(s, previous_handler)
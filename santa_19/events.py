@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+@dataclass(frozen=True)
+class ProgressEvent:
+    run: str
+    timestamp: float
+    phase: str
+    incumbent: Optional[float] = None
+    bound: Optional[float] = None
+    moves_per_second: Optional[float] = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @staticmethod
+    def from_json(line: str) -> ProgressEvent:
+        return ProgressEvent(**json.loads(line))
+
+
+def default_run_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class EventStream:
+    def __init__(self, path: Optional[Path] = None, run: str = "") -> None:
+        self.path = path
+        self.run = run or default_run_name()
+
+    def publish(
+        self,
+        phase: str,
+        incumbent: Optional[float] = None,
+        bound: Optional[float] = None,
+        moves_per_second: Optional[float] = None,
+    ) -> None:
+        if self.path is None:
+            return
+        event = ProgressEvent(
+            run=self.run,
+            timestamp=time.time(),
+            phase=phase,
+            incumbent=incumbent,
+            bound=bound,
+            moves_per_second=moves_per_second,
+        )
+        # A single write to a file opened in append mode keeps lines intact
+        # when several solves publish to the same stream.
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (event.to_json() + "\n").encode())
+        finally:
+            os.close(fd)
+
+
+NO_EVENTS = EventStream()
+
+
+def follow(
+    path: Path, from_start: bool = True, interval: float = 0.5
+) -> Iterator[ProgressEvent]:
+    while not path.exists():
+        time.sleep(interval)
+    with path.open("rt") as rfile:
+        if not from_start:
+            rfile.seek(0, os.SEEK_END)
+        pending = ""
+        while True:
+            line = rfile.readline()
+            if not line:
+                time.sleep(interval)
+                continue
+            pending += line
+            if pending.endswith("\n"):
+                yield ProgressEvent.from_json(pending)
+                pending = ""
+
+
+def read_events(path: Path) -> Iterator[ProgressEvent]:
+    with path.open("rt") as rfile:
+        for line in rfile:
+            if line.strip():
+                yield ProgressEvent.from_json(line)
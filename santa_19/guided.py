@@ -0,0 +1,245 @@
+import logging
+import time
+from collections import defaultdict
+from heapq import nlargest
+from typing import (
+    AbstractSet,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Set,
+    Tuple,
+)
+
+from santa_19.costs import accounting_cost, preference_cost
+from santa_19.deadline import NO_DEADLINE, Deadline
+from santa_19.events import NO_EVENTS, EventStream
+from santa_19.inputs import Day, Family
+from santa_19.parameters import DEFAULT_CAPACITY, Capacity
+from santa_19.solution import Solution
+from santa_19.typing import Assignments, FamilyID, Occupancies
+
+logger = logging.getLogger(__name__)
+
+Feature = Tuple[FamilyID, Day]
+
+
+class DayCosts:
+    """Per-day preference and accounting cost, updated move by move."""
+
+    def __init__(
+        self,
+        assignments: Assignments,
+        occupancies: Occupancies,
+        family_index: Mapping[FamilyID, Family],
+        days: Iterable[Day],
+        capacity: Capacity = DEFAULT_CAPACITY,
+    ) -> None:
+        self.days = list(days)
+        self.capacity = capacity
+        self.assignments = dict(assignments)
+        self.occupancies = dict(occupancies)
+        self.preference: Dict[Day, float] = {day: 0.0 for day in self.days}
+        for family_id, day in self.assignments.items():
+            self.preference[day] += _preference(family_index[family_id], day)
+        self.accounting: Dict[Day, float] = {
+            day: self._accounting_term(day) for day in self.days
+        }
+
+    def _accounting_term(self, day: Day) -> float:
+        occupancy = self.occupancies[day]
+        return accounting_cost(
+            occupancy, self.occupancies.get(day + 1, occupancy)
+        )
+
+    def _accounting_days(self, *changed: Day) -> AbstractSet[Day]:
+        return {
+            d
+            for day in changed
+            for d in (day - 1, day)
+            if d in self.accounting
+        }
+
+    def total(self) -> float:
+        return sum(self.preference.values()) + sum(self.accounting.values())
+
+    def day_cost(self, day: Day) -> float:
+        return self.preference[day] + self.accounting[day]
+
+    def hotspots(self, count: int) -> List[Day]:
+        return nlargest(count, self.days, key=self.day_cost)
+
+    def is_feasible_move(self, family: Family, new_day: Day) -> bool:
+        current_day = self.assignments[family.id]
+        n = family.number_of_members
+        return (
+            self.occupancies[current_day] - n >= self.capacity.minimum
+            and self.occupancies[new_day] + n <= self.capacity.maximum
+        )
+
+    def move_delta(self, family: Family, new_day: Day) -> float:
+        current_day = self.assignments[family.id]
+        affected = self._accounting_days(current_day, new_day)
+        before = sum(self.accounting[day] for day in affected)
+
+        self._shift(family.number_of_members, current_day, new_day)
+        after = sum(self._accounting_term(day) for day in affected)
+        self._shift(family.number_of_members, new_day, current_day)
+
+        return (
+            after
+            - before
+            + _preference(family, new_day)
+            - _preference(family, current_day)
+        )
+
+    def apply(self, family: Family, new_day: Day) -> None:
+        current_day = self.assignments[family.id]
+        self._shift(family.number_of_members, current_day, new_day)
+        self.assignments[family.id] = new_day
+        self.preference[current_day] -= _preference(family, current_day)
+        self.preference[new_day] += _preference(family, new_day)
+        for day in self._accounting_days(current_day, new_day):
+            self.accounting[day] = self._accounting_term(day)
+
+    def _shift(self, n: int, from_day: Day, to_day: Day) -> None:
+        self.occupancies[from_day] -= n
+        self.occupancies[to_day] += n
+
+
+def _preference(family: Family, day: Day) -> float:
+    return preference_cost(day, family.choice_index, family.number_of_members)
+
+
+def _region(hotspots: Iterable[Day], days: AbstractSet[Day]) -> List[Day]:
+    return sorted(
+        {d for day in hotspots for d in (day - 1, day, day + 1) if d in days}
+    )
+
+
+def _descend(
+    costs: DayCosts,
+    region: Collection[Day],
+    families_on_day: Dict[Day, Set[FamilyID]],
+    family_index: Mapping[FamilyID, Family],
+    penalties: Mapping[Feature, int],
+    penalty_weight: float,
+    deadline: Deadline = NO_DEADLINE,
+) -> int:
+    # First-improvement descent on the penalized cost, moving families
+    # assigned to the region to any of their choices.
+    evaluated_moves = 0
+    improved = True
+    while improved and not deadline.expired():
+        improved = False
+        for day in region:
+            for family_id in list(families_on_day[day]):
+                family = family_index[family_id]
+                current_day = costs.assignments[family_id]
+                for new_day in family.choices:
+                    if new_day == current_day or not costs.is_feasible_move(
+                        family, new_day
+                    ):
+                        continue
+                    evaluated_moves += 1
+                    delta = costs.move_delta(family, new_day) + (
+                        penalty_weight
+                        * (
+                            penalties.get((family_id, new_day), 0)
+                            - penalties.get((family_id, current_day), 0)
+                        )
+                    )
+                    if delta < -1e-9:
+                        costs.apply(family, new_day)
+                        families_on_day[current_day].discard(family_id)
+                        families_on_day[new_day].add(family_id)
+                        current_day = new_day
+                        improved = True
+    return evaluated_moves
+
+
+def guided_local_search(
+    solution: Solution,
+    family_index: Mapping[FamilyID, Family],
+    days: Iterable[Day],
+    iterations: int = 200,
+    hotspot_count: int = 5,
+    penalty_factor: float = 0.3,
+    patience: int = 50,
+    events: EventStream = NO_EVENTS,
+    deadline: Deadline = NO_DEADLINE,
+    capacity: Capacity = DEFAULT_CAPACITY,
+) -> Solution:
+    days = list(days)
+    costs = DayCosts(
+        solution.assignments,
+        solution.daily_occupancy,
+        family_index,
+        days,
+        capacity,
+    )
+    families_on_day: Dict[Day, Set[FamilyID]] = defaultdict(set)
+    for family_id, day in costs.assignments.items():
+        families_on_day[day].add(family_id)
+
+    penalties: Dict[Feature, int] = {}
+    penalty_weight = penalty_factor * costs.total() / max(len(family_index), 1)
+    best_cost = costs.total()
+    best_assignments = dict(costs.assignments)
+    since_improvement = 0
+
+    iteration = 0
+    for iteration in range(1, iterations + 1):
+        start = time.perf_counter()
+        region = _region(costs.hotspots(hotspot_count), set(days))
+        evaluated_moves = _descend(
+            costs,
+            region,
+            families_on_day,
+            family_index,
+            penalties,
+            penalty_weight,
+            deadline,
+        )
+
+        current_cost = costs.total()
+        if current_cost < best_cost - 1e-9:
+            best_cost = current_cost
+            best_assignments = dict(costs.assignments)
+            since_improvement = 0
+            logger.info(f"Guided search improved solution: {best_cost}.")
+        else:
+            since_improvement += 1
+        events.publish(
+            "guided",
+            incumbent=best_cost,
+            moves_per_second=evaluated_moves
+            / max(time.perf_counter() - start, 1e-9),
+        )
+        if since_improvement >= patience or deadline.expired():
+            break
+
+        # Penalize the assignments in the region with maximum utility, so
+        # the next descent is pushed away from this local optimum.
+        utilities = {
+            (family_id, day): _preference(family_index[family_id], day)
+            / (1 + penalties.get((family_id, day), 0))
+            for day in region
+            for family_id in families_on_day[day]
+        }
+        if not utilities:
+            break
+        max_utility = max(utilities.values())
+        if max_utility <= 0:
+            break
+        for feature, utility in utilities.items():
+            if utility == max_utility:
+                penalties[feature] = penalties.get(feature, 0) + 1
+
+    logger.info(
+        f"Guided search finished after {iteration} iterations: "
+        f"{best_cost}."
+    )
+    return Solution.from_assignments(best_assignments, days, family_index)
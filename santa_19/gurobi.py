@@ -1,8 +1,10 @@
 from contextlib import contextmanager
-from typing import Iterator
+from typing import Callable, Iterator
 
 import gurobipy as grb
 
+from santa_19.deadline import Deadline
+
 SERVER = "kl134fy5.is.klmcorp.net:8000"
 LICENSE = "Gurobi-AE"
 STDERR = "/dev/stderr"
@@ -15,3 +17,12 @@ def model(name: str) -> Iterator[grb.Model]:
         with grb.Model(name, env) as model:
             model.setParam("LogFile", STDERR)
             yield model
+
+
+def terminate_callback(deadline: Deadline) -> Callable[[grb.Model, int], None]:
+    # Stops the solve as soon as the deadline expires or is cancelled.
+    def callback(model: grb.Model, where: int) -> None:
+        if deadline.expired():
+            model.terminate()
+
+    return callback
@@ -0,0 +1,102 @@
+import logging
+import math
+import multiprocessing
+from typing import Iterable, Mapping, Optional, Sequence, Tuple
+
+from santa_19.inputs import Day, Family
+from santa_19.solution import Solution
+from santa_19.typing import Assignments, FamilyID
+
+logger = logging.getLogger(__name__)
+
+_ENGINE_NAME_LENGTH = 32
+
+
+class SharedIncumbent:
+    # The best solution found by any process of a portfolio: its cost, the
+    # engine that found it and one day per family in `family_ids` order. It
+    # is created before the engine processes start and inherited by them.
+    def __init__(
+        self,
+        family_ids: Sequence[FamilyID],
+        target: Optional[float] = None,
+        context: Optional[multiprocessing.context.BaseContext] = None,
+    ) -> None:
+        context = context or multiprocessing.get_context()
+        self.family_ids = list(family_ids)
+        self.target = target
+        self._lock = context.Lock()
+        self._stop = context.Event()
+        self._cost = context.RawValue("d", math.inf)
+        self._bound = context.RawValue("d", -math.inf)
+        self._version = context.RawValue("i", 0)
+        self._engine = context.RawArray("c", _ENGINE_NAME_LENGTH)
+        self._days = context.RawArray("i", len(self.family_ids))
+
+    def offer(
+        self, assignments: Assignments, cost: float, engine: str
+    ) -> bool:
+        with self._lock:
+            if cost >= self._cost.value:
+                return False
+            for i, family_id in enumerate(self.family_ids):
+                self._days[i] = assignments[family_id]
+            self._cost.value = cost
+            self._engine.value = engine.encode()[: _ENGINE_NAME_LENGTH - 1]
+            self._version.value += 1
+        logger.info(f"New shared incumbent {cost:.2f} from {engine}")
+        if self.target is not None and cost <= self.target:
+            logger.info(f"{engine} reached the target {self.target}")
+            self.stop()
+        return True
+
+    def cost(self) -> float:
+        return self._cost.value
+
+    def version(self) -> int:
+        return self._version.value
+
+    def engine(self) -> str:
+        return self._engine.value.decode()
+
+    def best(self) -> Optional[Tuple[float, Assignments]]:
+        with self._lock:
+            if self._version.value == 0:
+                return None
+            return self._cost.value, dict(zip(self.family_ids, self._days))
+
+    def exchange(
+        self,
+        solution: Solution,
+        cost: float,
+        engine: str,
+        family_index: Mapping[FamilyID, Family],
+        days: Iterable[Day],
+    ) -> Tuple[Solution, float]:
+        # Publishes the solution if it is the best so far, otherwise returns
+        # the shared one to continue from.
+        if self.offer(solution.assignments, cost, engine):
+            return solution, cost
+        best = self.best()
+        if best is None or best[0] >= cost:
+            return solution, cost
+        shared_cost, assignments = best
+        return (
+            Solution.from_assignments(assignments, days, family_index),
+            shared_cost,
+        )
+
+    def prove(self, bound: float, engine: str) -> None:
+        with self._lock:
+            self._bound.value = max(self._bound.value, bound)
+        logger.info(f"{engine} proved the incumbent optimal (bound {bound})")
+        self.stop()
+
+    def bound(self) -> float:
+        return self._bound.value
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stopped(self) -> bool:
+        return self._stop.is_set()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import csv
+import random
 from dataclasses import dataclass
 from itertools import islice
 from pathlib import Path
@@ -9,6 +10,7 @@ from typing import (
     Collection,
     Iterable,
     Iterator,
+    List,
     Mapping,
     Sequence,
     T,
@@ -23,8 +25,6 @@ from santa_19.typing import (
     OrderedChoices,
 )
 
-_UNRELATED_CHOICE_INDEX = 10
-
 
 @dataclass(frozen=True)
 class Family:
@@ -35,11 +35,12 @@ class Family:
 
     @staticmethod
     def parse(row: Sequence[str]) -> Family:
+        # family_id, any number of choice columns, number of members
         return Family(
             id=int(row[0]),
-            choices=[int(c) for c in row[1:11]],
-            choice_index={int(c): i for i, c in enumerate(row[1:11])},
-            number_of_members=int(row[11]),
+            choices=[int(c) for c in row[1:-1]],
+            choice_index={int(c): i for i, c in enumerate(row[1:-1])},
+            number_of_members=int(row[-1]),
         )
 
 
@@ -55,11 +56,52 @@ def families_per_day(
     return per_day
 
 
+def generate_families(
+    n_families: int,
+    days: Sequence[Day],
+    n_choices: int = 10,
+    min_members: int = 2,
+    max_members: int = 8,
+    seed: int = 0,
+) -> List[Family]:
+    rng = random.Random(seed)
+    families = []
+    for family_id in range(n_families):
+        choices = rng.sample(days, n_choices)
+        families.append(
+            Family(
+                id=family_id,
+                choices=choices,
+                choice_index={day: i for i, day in enumerate(choices)},
+                number_of_members=rng.randint(min_members, max_members),
+            )
+        )
+    return families
+
+
+def write_families(p: Path, families: Iterable[Family]) -> None:
+    families = list(families)
+    n_choices = max((len(f.choices) for f in families), default=0)
+    with p.open("wt", newline="") as wfile:
+        writer = csv.writer(wfile)
+        writer.writerow(
+            ["family_id"]
+            + [f"choice_{i}" for i in range(n_choices)]
+            + ["n_people"]
+        )
+        for family in families:
+            writer.writerow(
+                [family.id] + family.choices + [family.number_of_members]
+            )
+
+
 def choice(choices_by_day: ChoicesByDay, day: Day) -> ChoiceIndex:
     try:
         return choices_by_day[day]
     except KeyError:
-        return _UNRELATED_CHOICE_INDEX
+        # An unlisted day ranks after all of the family's choices, however
+        # many there are.
+        return len(choices_by_day)
 
 
 def parse_assignments(
@@ -78,3 +120,28 @@ def parse_csv(
 ) -> Iterator[T]:
     with p.open("rt") as rfile:
         yield from map(parser, islice(csv.reader(rfile), 1, None))
+
+
+@dataclass(frozen=True)
+class FamilyDiff:
+    added: Collection[FamilyID]
+    removed: Collection[FamilyID]
+    changed: Collection[FamilyID]
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+def diff_families(
+    base: Mapping[FamilyID, Family],
+    updated: Mapping[FamilyID, Family],
+) -> FamilyDiff:
+    return FamilyDiff(
+        added=sorted(set(updated.keys()).difference(base.keys())),
+        removed=sorted(set(base.keys()).difference(updated.keys())),
+        changed=sorted(
+            family_id
+            for family_id, family in updated.items()
+            if family_id in base and base[family_id] != family
+        ),
+    )
@@ -1,2 +1,34 @@
+from dataclasses import dataclass
+from typing import List
+
+from santa_19.typing import Day
+
 MIN_OCCUPANCY = 125
 MAX_OCCUPANCY = 300
+
+DAYS = list(range(1, 101))
+
+
+@dataclass(frozen=True)
+class Capacity:
+    minimum: int = MIN_OCCUPANCY
+    maximum: int = MAX_OCCUPANCY
+
+    def __post_init__(self) -> None:
+        # The accounting cost is only defined, i.e. non-negative, from the
+        # Kaggle minimum occupancy on.
+        if not MIN_OCCUPANCY <= self.minimum <= self.maximum:
+            raise ValueError(
+                f"Invalid capacity bounds: [{self.minimum}, {self.maximum}], "
+                f"the minimum must be at least {MIN_OCCUPANCY}"
+            )
+
+    def occupancies(self) -> range:
+        return range(self.minimum, self.maximum + 1)
+
+
+DEFAULT_CAPACITY = Capacity()
+
+
+def horizon(n_days: int) -> List[Day]:
+    return list(range(1, n_days + 1))
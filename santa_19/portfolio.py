@@ -0,0 +1,225 @@
+import logging
+import multiprocessing
+import random
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Collection, List, Mapping, Optional, Sequence
+
+from santa_19.config import ENGINES, FAMILY_ORDERS, IMPROVEMENTS, SolverConfig
+from santa_19.deadline import Deadline, cancel_on_signals
+from santa_19.events import EventStream
+from santa_19.incumbent import SharedIncumbent
+from santa_19.inputs import Day, Family, families_per_day
+from santa_19.parameters import DEFAULT_CAPACITY, Capacity
+from santa_19.result import evaluate
+from santa_19.solution import Solution, is_capacity_infeasible
+from santa_19.solver import improve, solve
+from santa_19.typing import FamilyID
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_ENGINES = IMPROVEMENTS + ENGINES
+DEFAULT_PORTFOLIO = ("naive", "guided", "batch", "mip")
+
+_EPSILON = 1e-6
+
+
+@dataclass(frozen=True)
+class PortfolioResult:
+    solution: Optional[Solution]
+    cost: float
+    engine: str
+    bound: float
+
+    @property
+    def proven(self) -> bool:
+        return self.bound >= self.cost - _EPSILON
+
+
+class _PortfolioDeadline(Deadline):
+    # Expires with its own time limit or as soon as any process stops the
+    # portfolio, e.g. because the target was reached.
+    def __init__(self, seconds: Optional[float], shared: SharedIncumbent):
+        super().__init__(seconds)
+        self.shared = shared
+
+    def remaining(self) -> Optional[float]:
+        if self.shared.stopped():
+            self.cancel()
+        return super().remaining()
+
+
+def _engine_config(engine: str, index: int) -> SolverConfig:
+    # Engines of the same kind construct from different family orders.
+    family_order = FAMILY_ORDERS[index % len(FAMILY_ORDERS)]
+    if engine in ENGINES:
+        # The heuristic engines alongside provide better starts than a long
+        # local search would.
+        return SolverConfig(
+            family_order=family_order,
+            max_improvement_passes=1,
+            engine=engine,
+        )
+    return SolverConfig(
+        family_order=family_order, improvement=engine, use_mip=False
+    )
+
+
+def _perturb(
+    solution: Solution,
+    family_index: Mapping[FamilyID, Family],
+    rng: random.Random,
+    moves: int,
+    capacity: Capacity,
+) -> Solution:
+    assignments = dict(solution.assignments)
+    occupancy = dict(solution.daily_occupancy)
+    for family_id in rng.sample(
+        list(assignments), min(moves, len(assignments))
+    ):
+        family = family_index[family_id]
+        current, day = assignments[family_id], rng.choice(family.choices)
+        n = family.number_of_members
+        if day == current or is_capacity_infeasible(
+            [occupancy[current] - n, occupancy[day] + n], capacity
+        ):
+            continue
+        assignments[family_id] = day
+        occupancy[current] -= n
+        occupancy[day] += n
+    return Solution(assignments, occupancy)
+
+
+def _run_engine(
+    engine: str,
+    index: int,
+    families: List[Family],
+    days: List[Day],
+    capacity: Capacity,
+    shared: SharedIncumbent,
+    seconds: Optional[float],
+    events_file: Optional[Path],
+    run: str,
+    perturbation: int,
+    seed: int,
+) -> None:
+    deadline = _PortfolioDeadline(seconds, shared)
+    events = EventStream(events_file, f"{run}-{engine}-{index}")
+    family_index = {f.id: f for f in families}
+    config = _engine_config(engine, index)
+
+    with cancel_on_signals(deadline):
+        solution = solve(
+            families,
+            families_per_day(families, days),
+            family_index,
+            days,
+            config,
+            events,
+            deadline,
+            capacity,
+            shared,
+        )
+        if engine in ENGINES:
+            return
+
+        # Iterated local search: restart from the best solution of all
+        # engines, perturb it and improve it again.
+        rng = random.Random(seed + index)
+        cost = evaluate(solution, family_index, days).total_cost()
+        while not deadline.expired():
+            solution, cost = shared.exchange(
+                solution, cost, engine, family_index, days
+            )
+            candidate = improve(
+                _perturb(solution, family_index, rng, perturbation, capacity),
+                families,
+                family_index,
+                days,
+                config,
+                events,
+                deadline,
+                capacity,
+            )
+            candidate_cost = evaluate(
+                candidate, family_index, days
+            ).total_cost()
+            if candidate_cost < cost:
+                solution, cost = candidate, candidate_cost
+        shared.offer(solution.assignments, cost, engine)
+
+
+def run_portfolio(
+    families: Collection[Family],
+    days: Sequence[Day],
+    engines: Sequence[str] = DEFAULT_PORTFOLIO,
+    capacity: Capacity = DEFAULT_CAPACITY,
+    time_limit: Optional[float] = None,
+    target: Optional[float] = None,
+    events_file: Optional[Path] = None,
+    run: str = "portfolio",
+    perturbation: int = 50,
+    seed: int = 0,
+) -> PortfolioResult:
+    for engine in engines:
+        if engine not in PORTFOLIO_ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+    families = list(families)
+    family_index = {f.id: f for f in families}
+    shared = SharedIncumbent([f.id for f in families], target)
+    deadline = Deadline(time_limit)
+
+    processes = [
+        multiprocessing.Process(
+            target=_run_engine,
+            args=(
+                engine,
+                index,
+                families,
+                list(days),
+                capacity,
+                shared,
+                time_limit,
+                events_file,
+                run,
+                perturbation,
+                seed,
+            ),
+            name=f"portfolio-{engine}-{index}",
+        )
+        for index, engine in enumerate(engines)
+    ]
+    with cancel_on_signals(deadline):
+        try:
+            for process in processes:
+                process.start()
+            running = list(processes)
+            while running:
+                if deadline.expired() and not shared.stopped():
+                    shared.stop()
+                wait([p.sentinel for p in running], timeout=0.5)
+                running = [p for p in running if p.is_alive()]
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+
+    for process in processes:
+        if process.exitcode != 0:
+            logger.error(
+                f"Engine {process.name} failed with exit code "
+                f"{process.exitcode}"
+            )
+
+    best = shared.best()
+    if best is None:
+        return PortfolioResult(None, float("inf"), "", shared.bound())
+    cost, assignments = best
+    return PortfolioResult(
+        solution=Solution.from_assignments(assignments, days, family_index),
+        cost=cost,
+        engine=shared.engine(),
+        bound=shared.bound(),
+    )
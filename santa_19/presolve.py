@@ -0,0 +1,282 @@
+import logging
+import math
+from dataclasses import dataclass
+from typing import (
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import gurobipy as grb
+import numpy as np
+from gurobipy.gurobipy import GRB
+
+from santa_19 import gurobi
+from santa_19.costs import accounting_cost, preference_cost
+from santa_19.deadline import NO_DEADLINE, Deadline
+from santa_19.inputs import Day, Family
+from santa_19.parameters import DEFAULT_CAPACITY, Capacity
+from santa_19.typing import FamilyID
+
+logger = logging.getLogger(__name__)
+
+_EPSILON = 1e-6
+
+
+@dataclass(frozen=True)
+class Domains:
+    # What is left of the MIP after presolve: the choices of every family,
+    # the occupancy levels of every day and, per day, the largest accounting
+    # cost of an occupancy pair that can still be part of an improving
+    # solution.
+    upper_bound: float
+    lower_bound: float
+    choices: Mapping[FamilyID, Tuple[Day, ...]]
+    occupancies: Mapping[Day, Tuple[int, ...]]
+    pair_budget: Mapping[Day, float]
+
+
+def full_domains(
+    families: Iterable[Family],
+    days: Iterable[Day],
+    capacity: Capacity = DEFAULT_CAPACITY,
+    upper_bound: float = math.inf,
+) -> Domains:
+    days = list(days)
+    return Domains(
+        upper_bound=upper_bound,
+        lower_bound=-math.inf,
+        choices={f.id: tuple(f.choices) for f in families},
+        occupancies={d: tuple(capacity.occupancies()) for d in days},
+        pair_budget={d: math.inf for d in days},
+    )
+
+
+def _kept_pair_costs(
+    pair_costs: np.ndarray,
+    kept: Mapping[Day, np.ndarray],
+    days: Sequence[Day],
+) -> Iterator[Tuple[Day, Optional[Day], np.ndarray]]:
+    # Accounting cost of every kept occupancy pair (o, o') of day d and d+1,
+    # inf elsewhere, one day at a time. The last day is paired with itself.
+    for d, d_next in zip(days, days[1:]):
+        yield d, d_next, np.where(
+            kept[d][:, None] & kept[d_next][None, :], pair_costs, np.inf
+        )
+    last = np.full(pair_costs.shape, np.inf)
+    np.fill_diagonal(
+        last, np.where(kept[days[-1]], np.diag(pair_costs), np.inf)
+    )
+    yield days[-1], None, last
+
+
+def _overflow_cost(
+    members: np.ndarray, extra: np.ndarray, excess: int
+) -> float:
+    # Cheapest way to move at least `excess` members off a day, when moving
+    # a family costs at least `extra`: the fractional knapsack bound.
+    if excess <= 0:
+        return 0.0
+    order = np.argsort(extra / members)
+    moved = np.cumsum(members[order])
+    last = int(np.searchsorted(moved, excess))
+    if last == len(order):
+        return math.inf
+    whole = order[:last]
+    remainder = excess - (moved[last - 1] if last > 0 else 0)
+    partial = extra[order[last]] * remainder / members[order[last]]
+    return float(extra[whole].sum() + partial)
+
+
+def presolve(
+    families: Collection[Family],
+    days: Iterable[Day],
+    upper_bound: float,
+    capacity: Capacity = DEFAULT_CAPACITY,
+    max_rounds: int = 20,
+) -> Domains:
+    # Every solution costs at least
+    # - the best preference of each family,
+    # - for every day whose best-choice families do not fit its largest
+    #   reachable occupancy, the cheapest way of moving the excess members
+    #   to their next best choice,
+    # - the cheapest kept occupancy pair of each day.
+    # A choice, an occupancy level or a pair whose extra cost over that
+    # bound exceeds the gap to the incumbent cannot be in an improving
+    # solution. Dropping them shrinks the reachable and forced occupancy
+    # per day, which tightens the bound again, until nothing changes.
+    days = list(days)
+    levels = np.array(capacity.occupancies())
+    pair_costs = accounting_cost(levels[:, None], levels[None, :])
+    preference = {
+        f.id: {
+            c: preference_cost(c, f.choice_index, f.number_of_members)
+            for c in f.choices
+        }
+        for f in families
+    }
+    choices = {f.id: list(f.choices) for f in families}
+    kept = {d: np.ones(len(levels), dtype=bool) for d in days}
+
+    for presolve_round in range(1, max_rounds + 1):
+        changed = False
+        reachable = {d: 0 for d in days}
+        forced = {d: 0 for d in days}
+        for family in families:
+            for c in choices[family.id]:
+                reachable[c] += family.number_of_members
+            if len(choices[family.id]) == 1:
+                forced[choices[family.id][0]] += family.number_of_members
+        for d in days:
+            in_range = (levels >= forced[d]) & (levels <= reachable[d])
+            changed |= bool((kept[d] & ~in_range).any())
+            kept[d] &= in_range
+
+        # Preference part: best choices and what leaving them costs.
+        best_choice: Dict[FamilyID, Day] = {}
+        best_preference: Dict[FamilyID, float] = {}
+        leaving: Dict[FamilyID, float] = {}
+        per_best_day: Dict[Day, List[Family]] = {d: [] for d in days}
+        for family in families:
+            ranked = sorted(
+                choices[family.id], key=lambda c: preference[family.id][c]
+            )
+            best_choice[family.id] = ranked[0]
+            best_preference[family.id] = preference[family.id][ranked[0]]
+            leaving[family.id] = (
+                preference[family.id][ranked[1]] - best_preference[family.id]
+                if len(ranked) > 1
+                else math.inf
+            )
+            per_best_day[ranked[0]].append(family)
+        overflow = {}
+        for d, crowd in per_best_day.items():
+            members = np.array([f.number_of_members for f in crowd], float)
+            largest = levels[kept[d]].max() if kept[d].any() else 0
+            overflow[d] = _overflow_cost(
+                members,
+                np.array([leaving[f.id] for f in crowd], float),
+                int(members.sum()) - int(largest),
+            )
+
+        # Accounting part, one day at a time.
+        accounting_min: Dict[Day, float] = {}
+        outgoing: Dict[Day, np.ndarray] = {}
+        incoming: Dict[Day, np.ndarray] = {}
+        for d, d_next, costs in _kept_pair_costs(pair_costs, kept, days):
+            outgoing[d] = costs.min(axis=1)
+            accounting_min[d] = float(outgoing[d].min())
+            if d_next is not None:
+                incoming[d_next] = costs.min(axis=0)
+
+        lower_bound = (
+            sum(best_preference.values())
+            + sum(overflow.values())
+            + sum(accounting_min.values())
+        )
+        gap = upper_bound - lower_bound + _EPSILON
+
+        for i, d in enumerate(days):
+            extra = outgoing[d] - accounting_min[d]
+            if i > 0:
+                extra += incoming[d] - accounting_min[days[i - 1]]
+            in_gap = extra <= gap
+            changed |= bool((kept[d] & ~in_gap).any())
+            kept[d] &= in_gap
+
+        for family_id, family_choices in choices.items():
+            # Assigning a family elsewhere than its best choice at most
+            # saves what leaving it contributes to the overflow bound.
+            released = (
+                leaving[family_id]
+                if overflow[best_choice[family_id]] > 0
+                else 0.0
+            )
+            keep = [
+                c
+                for c in family_choices
+                if c == best_choice[family_id]
+                or preference[family_id][c]
+                - best_preference[family_id]
+                - released
+                <= gap
+            ]
+            changed |= len(keep) < len(family_choices)
+            choices[family_id] = keep
+
+        if not changed:
+            break
+
+    pair_budget = {d: gap + accounting_min[d] for d in days}
+    n_pairs = sum(
+        int((costs <= pair_budget[d]).sum())
+        for d, _, costs in _kept_pair_costs(pair_costs, kept, days)
+    )
+    domains = Domains(
+        upper_bound=upper_bound,
+        lower_bound=lower_bound,
+        choices={f: tuple(c) for f, c in choices.items()},
+        occupancies={d: tuple(int(o) for o in levels[kept[d]]) for d in days},
+        pair_budget=pair_budget,
+    )
+    logger.info(
+        f"Presolve after {presolve_round} rounds (bounds {lower_bound:.2f} "
+        f"to {upper_bound:.2f}) kept "
+        f"{sum(len(c) for c in choices.values())} of "
+        f"{sum(len(f.choices) for f in families)} choices, "
+        f"{sum(len(o) for o in domains.occupancies.values())} of "
+        f"{len(levels) * len(days)} occupancy levels and {n_pairs} of "
+        f"{len(levels) ** 2 * (len(days) - 1) + len(levels)} occupancy pairs"
+    )
+    return domains
+
+
+def fix_by_reduced_costs(
+    model: grb.Model,
+    variables: Collection[grb.Var],
+    upper_bound: float,
+    deadline: Deadline = NO_DEADLINE,
+) -> int:
+    # Solving the LP relaxation gives a bound; a binary variable whose
+    # reduced cost lifts that bound above the incumbent keeps its LP value
+    # in every improving solution.
+    model.update()
+    relaxed = model.relax()
+    try:
+        relaxed.setParam("OutputFlag", 0)
+        remaining = deadline.remaining()
+        if remaining is not None:
+            relaxed.setParam("TimeLimit", remaining)
+        relaxed.optimize(gurobi.terminate_callback(deadline))
+        if relaxed.status != GRB.OPTIMAL:
+            # Also when interrupted by the deadline or a signal.
+            return 0
+
+        relaxed_vars = relaxed.getVars()
+        columns = [relaxed_vars[v.index] for v in variables]
+        values = relaxed.getAttr("X", columns)
+        reduced_costs = relaxed.getAttr("RC", columns)
+        bound = relaxed.ObjVal
+        fixed = 0
+        for var, value, reduced_cost in zip(variables, values, reduced_costs):
+            if bound + abs(reduced_cost) <= upper_bound + _EPSILON:
+                continue
+            if value < 0.5 and reduced_cost > 0:
+                var.ub = 0.0
+                fixed += 1
+            elif value > 0.5 and reduced_cost < 0:
+                var.lb = 1.0
+                fixed += 1
+        logger.info(
+            f"Reduced cost fixing (LP bound {bound:.2f}) fixed {fixed} of "
+            f"{len(variables)} variables"
+        )
+        return fixed
+    finally:
+        relaxed.dispose()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Collection, List, Sequence
+
+import numpy as np
+from plotly import graph_objects as go
+from plotly.subplots import make_subplots
+
+from santa_19.inputs import Day
+from santa_19.parameters import DEFAULT_CAPACITY, Capacity
+from santa_19.typing import Assignments
+from santa_19.vectorized import FamilyArrays, accounting_terms
+
+logger = logging.getLogger(__name__)
+
+_UNASSIGNED = -1
+
+
+@dataclass(frozen=True)
+class SolutionSummary:
+    name: str
+    # Members per (choice level, day); the last level is "no choice".
+    occupancy_by_choice: np.ndarray
+    preference_cost: float
+    accounting_cost: float
+    feasible: bool
+
+    def total_cost(self) -> float:
+        return self.preference_cost + self.accounting_cost
+
+    def daily_occupancy(self) -> np.ndarray:
+        return self.occupancy_by_choice.sum(axis=0)
+
+
+def summarize_solution(
+    name: str,
+    assignments: Assignments,
+    arrays: FamilyArrays,
+    days: Sequence[Day],
+    capacity: Capacity = DEFAULT_CAPACITY,
+) -> SolutionSummary:
+    n_days = max(days)
+    assigned = np.array(
+        [assignments.get(family_id, _UNASSIGNED) for family_id in arrays.ids]
+    )
+    is_assigned = (assigned >= 1) & (assigned <= n_days)
+
+    match = arrays.choices == assigned[:, None]
+    n_levels = arrays.choices.shape[1] + 1
+    levels = np.where(match.any(axis=1), match.argmax(axis=1), n_levels - 1)
+
+    occupancy_by_choice = np.bincount(
+        (levels * (n_days + 1) + assigned)[is_assigned],
+        weights=arrays.sizes[is_assigned],
+        minlength=n_levels * (n_days + 1),
+    ).reshape(n_levels, n_days + 1)
+    occupancy = occupancy_by_choice.sum(axis=0)
+
+    day_occupancy = occupancy[np.asarray(days)]
+    feasible = bool(
+        is_assigned.all()
+        and len(assignments) == len(arrays.ids)
+        and (day_occupancy >= capacity.minimum).all()
+        and (day_occupancy <= capacity.maximum).all()
+    )
+    if not feasible:
+        logger.warning(f"Solution {name} is infeasible.")
+
+    return SolutionSummary(
+        name=name,
+        occupancy_by_choice=occupancy_by_choice[:, 1:],
+        preference_cost=float(
+            arrays.assigned_preference(assigned)[is_assigned].sum()
+        ),
+        accounting_cost=float(accounting_terms(occupancy)[1:].sum()),
+        feasible=feasible,
+    )
+
+
+def build_report(
+    summaries: Collection[SolutionSummary],
+    days: Sequence[Day],
+    capacity: Capacity = DEFAULT_CAPACITY,
+) -> go.Figure:
+    summaries = list(summaries)
+    fig = make_subplots(
+        rows=len(summaries) + 1,
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.04,
+        subplot_titles=["Daily occupancy"]
+        + [_title(summary) for summary in summaries],
+    )
+
+    for summary in summaries:
+        fig.add_trace(
+            go.Scatter(
+                x=days,
+                y=summary.daily_occupancy(),
+                mode="lines",
+                name=summary.name,
+            ),
+            row=1,
+            col=1,
+        )
+    for bound, name in (
+        (capacity.minimum, "Min Occupancy"),
+        (capacity.maximum, "Max Occupancy"),
+    ):
+        fig.add_trace(
+            go.Scatter(
+                x=[days[0], days[-1]],
+                y=[bound, bound],
+                mode="lines",
+                line={"dash": "dash", "color": "grey"},
+                name=name,
+            ),
+            row=1,
+            col=1,
+        )
+
+    colors = _choice_colors(summaries[0].occupancy_by_choice.shape[0])
+    for row, summary in enumerate(summaries, start=2):
+        for level, members in enumerate(summary.occupancy_by_choice):
+            fig.add_trace(
+                go.Bar(
+                    x=days,
+                    y=members,
+                    name=_choice_name(level, len(colors)),
+                    legendgroup=f"choice-{level}",
+                    showlegend=row == 2,
+                    marker_color=colors[level],
+                ),
+                row=row,
+                col=1,
+            )
+
+    fig.update_layout(
+        barmode="stack",
+        height=300 * (len(summaries) + 1),
+        title="Solution comparison",
+    )
+    return fig
+
+
+def write_report(fig: go.Figure, p: Path) -> None:
+    if p.suffix == ".html":
+        # plotly.js is embedded so that the report renders offline.
+        fig.write_html(str(p), include_plotlyjs=True)
+    else:
+        # Static images need the optional kaleido package.
+        fig.write_image(str(p))
+    logger.info(f"Report written to {p}")
+
+
+def _title(summary: SolutionSummary) -> str:
+    return (
+        f"{summary.name}: total {summary.total_cost():.2f} "
+        f"(pref.: {summary.preference_cost:.2f}, "
+        f"acc.: {summary.accounting_cost:.2f})"
+        + ("" if summary.feasible else " INFEASIBLE")
+    )
+
+
+def _choice_name(level: int, n_levels: int) -> str:
+    return "No choice" if level == n_levels - 1 else f"Choice {level}"
+
+
+def _choice_colors(n_levels: int) -> List[str]:
+    palette = [
+        "#1a9850",
+        "#66bd63",
+        "#a6d96a",
+        "#d9ef8b",
+        "#fee08b",
+        "#fdae61",
+        "#f46d43",
+        "#d73027",
+        "#a50026",
+        "#67001f",
+    ]
+    return [palette[i % len(palette)] for i in range(n_levels - 1)] + [
+        "#000000"
+    ]
@@ -3,7 +3,7 @@ import logging
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, Mapping
+from typing import Iterable, Mapping, Optional
 
 from santa_19.costs import (
     accounting_cost_of_daily_occupancy,
@@ -44,10 +44,13 @@ def evaluate(
     )
 
 
-def write_solution(solution: Solution) -> str:
-    file_name = Path(
-        f"data/outputs/solution_{datetime.now():%Y-%m-%d_%H:%M:%S%z}.csv"
-    )
+def write_solution(
+    solution: Solution, file_name: Optional[Path] = None
+) -> str:
+    if file_name is None:
+        file_name = Path(
+            f"data/outputs/solution_{datetime.now():%Y-%m-%d_%H:%M:%S%z}.csv"
+        )
     logger.info(f"Printing solution to {file_name}")
     with open(file_name, "w", newline="") as file:
         writer = csv.writer(file)
@@ -5,7 +5,7 @@ from dataclasses import dataclass
 from typing import Iterable, Mapping
 
 from santa_19.inputs import Family
-from santa_19.parameters import MAX_OCCUPANCY, MIN_OCCUPANCY
+from santa_19.parameters import DEFAULT_CAPACITY, Capacity
 from santa_19.typing import Assignments, Day, FamilyID, Occupancies
 
 logger = logging.getLogger(__name__)
@@ -43,9 +43,11 @@ class Solution:
         )
 
 
-def is_capacity_infeasible(occupancies: Iterable[int]) -> bool:
+def is_capacity_infeasible(
+    occupancies: Iterable[int], capacity: Capacity = DEFAULT_CAPACITY
+) -> bool:
     return any(
-        (occupancy < MIN_OCCUPANCY) or (occupancy > MAX_OCCUPANCY)
+        (occupancy < capacity.minimum) or (occupancy > capacity.maximum)
         for occupancy in occupancies
     )
 
@@ -53,8 +55,9 @@ def is_capacity_infeasible(occupancies: Iterable[int]) -> bool:
 def is_feasible(
     solution: Solution,
     families: Mapping[FamilyID, Family],
+    capacity: Capacity = DEFAULT_CAPACITY,
 ) -> bool:
-    if is_capacity_infeasible(solution.daily_occupancy.values()):
+    if is_capacity_infeasible(solution.daily_occupancy.values(), capacity):
         logger.info("Minimum or maximum occupancy violated.")
         return False
 
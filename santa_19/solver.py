@@ -1,27 +1,47 @@
 import logging
+import math
+import os
+import tempfile
+import time
 from functools import partial
 from itertools import chain
 from operator import attrgetter
 from typing import (
+    AbstractSet,
+    Callable,
     Collection,
     Dict,
     Iterable,
     Iterator,
+    List,
     Mapping,
     Optional,
     Tuple,
 )
 
+import gurobipy as grb
 from gurobipy.gurobipy import GRB, quicksum, tuplelist
 
 from santa_19 import gurobi
+from santa_19.colgen import column_generation
+from santa_19.config import DEFAULT_CONFIG, SolverConfig
 from santa_19.costs import (
     accounting_cost,
     accounting_cost_of_daily_occupancy,
     preference_cost,
 )
-from santa_19.inputs import Day, Family, choice
-from santa_19.parameters import MAX_OCCUPANCY, MIN_OCCUPANCY
+from santa_19.deadline import NO_DEADLINE, Deadline
+from santa_19.events import NO_EVENTS, EventStream
+from santa_19.guided import guided_local_search
+from santa_19.incumbent import SharedIncumbent
+from santa_19.inputs import Day, Family, FamilyDiff, choice
+from santa_19.parameters import DEFAULT_CAPACITY, Capacity
+from santa_19.presolve import (
+    Domains,
+    fix_by_reduced_costs,
+    full_domains,
+    presolve,
+)
 from santa_19.result import evaluate
 from santa_19.solution import Solution, is_capacity_infeasible
 from santa_19.typing import (
@@ -31,22 +51,30 @@ from santa_19.typing import (
     Occupancies,
     OccupanciesMutable,
 )
+from santa_19.vectorized import batch_improvement
 
 logger = logging.getLogger(__name__)
 
-_FEASIBLE_OCCUPANCIES = frozenset(range(MIN_OCCUPANCY, MAX_OCCUPANCY + 1))
+_EPSILON = 1e-6
+
+# Upper bound on the phi variables of the MIP; the Kaggle instance has about
+# 3.1 million candidates, a 365-day horizon with 800 occupancy levels over
+# 200 million, which does not fit in memory.
+MAX_MIP_OCCUPANCY_PAIRS = 5_000_000
 
 
 def _can_add(
     number_of_members: int,
     current_occupancy: int,
+    capacity: Capacity = DEFAULT_CAPACITY,
 ) -> bool:
-    return current_occupancy + number_of_members <= MAX_OCCUPANCY
+    return current_occupancy + number_of_members <= capacity.maximum
 
 
 def _process_unassigned_families(
     solution: Solution,
     unassigned_families: Collection[Family],
+    capacity: Capacity = DEFAULT_CAPACITY,
 ) -> Solution:
     still_unassigned = []
 
@@ -57,7 +85,11 @@ def _process_unassigned_families(
         unassigned_families, key=attrgetter("number_of_members"), reverse=True
     ):
         for f_choice in family.choices:
-            if _can_add(family.number_of_members, occupancy_per_day[f_choice]):
+            if _can_add(
+                family.number_of_members,
+                occupancy_per_day[f_choice],
+                capacity,
+            ):
                 assignments[family.id] = f_choice
                 occupancy_per_day[f_choice] += family.number_of_members
                 break
@@ -67,7 +99,7 @@ def _process_unassigned_families(
     while still_unassigned:
         family = still_unassigned.pop()
         for day, occupancy in occupancy_per_day.items():
-            if _can_add(family.number_of_members, occupancy):
+            if _can_add(family.number_of_members, occupancy, capacity):
                 assignments[family.id] = day
                 break
 
@@ -77,12 +109,13 @@ def _process_unassigned_families(
 def _fix_minimum_occupancy_infeasibility(
     solution: Solution,
     families_per_day: Mapping[Day, Collection[Family]],
+    capacity: Capacity = DEFAULT_CAPACITY,
 ) -> Solution:
 
     dates_with_violation: Mapping[Day, int] = {
         day: occupancy
         for day, occupancy in solution.daily_occupancy.items()
-        if occupancy < MIN_OCCUPANCY
+        if occupancy < capacity.minimum
     }
 
     assignments = dict(solution.assignments)
@@ -96,7 +129,7 @@ def _fix_minimum_occupancy_infeasibility(
             and (
                 occupancy_per_day[assignments[family.id]]
                 - family.number_of_members
-                >= MIN_OCCUPANCY
+                >= capacity.minimum
             )
         ]
         related_families = sorted(
@@ -109,30 +142,57 @@ def _fix_minimum_occupancy_infeasibility(
             occupancy_per_day[day] += family.number_of_members
             occupancy_per_day[current_assignment] -= family.number_of_members
 
-            if occupancy_per_day[day] >= MIN_OCCUPANCY:
+            if occupancy_per_day[day] >= capacity.minimum:
                 break
 
     return Solution(assignments, occupancy_per_day)
 
 
+_FAMILY_ORDERS: Mapping[str, Callable[[Collection[Family]], List[Family]]] = {
+    "members_desc": lambda families: sorted(
+        families, key=attrgetter("number_of_members"), reverse=True
+    ),
+    "members_asc": lambda families: sorted(
+        families, key=attrgetter("number_of_members")
+    ),
+    "input": list,
+}
+
+
+def _ordered_choices(
+    family: Family,
+    occupancy_per_day: Occupancies,
+    choice_order: str,
+) -> List[Day]:
+    if choice_order == "preference":
+        return list(family.choices)
+    return sorted(
+        family.choices,
+        key=lambda day: (occupancy_per_day[day], family.choice_index[day]),
+    )
+
+
 def _naive_assign(
     families: Collection[Family],
     days: Iterable[Day],
+    config: SolverConfig = DEFAULT_CONFIG,
+    capacity: Capacity = DEFAULT_CAPACITY,
 ) -> Tuple[Solution, Collection[Family]]:
-    sorted_families = sorted(
-        families, key=attrgetter("number_of_members"), reverse=True
-    )
+    sorted_families = _FAMILY_ORDERS[config.family_order](families)
 
     occupancy_per_day: Dict[Day, int] = {day: 0 for day in days}
     assignments = {}
     unassigned_families = []
 
     for family in sorted_families:
-        for f_choice in sorted(
-            family.choices,
-            key=lambda day: (occupancy_per_day[day], family.choice_index[day]),
+        for f_choice in _ordered_choices(
+            family, occupancy_per_day, config.choice_order
         ):
-            if _can_add(family.number_of_members, occupancy_per_day[f_choice]):
+            if _can_add(
+                family.number_of_members,
+                occupancy_per_day[f_choice],
+                capacity,
+            ):
                 occupancy_per_day[f_choice] += family.number_of_members
                 assignments[family.id] = f_choice
                 break
@@ -146,18 +206,24 @@ def _construct_solution(
     families: Collection[Family],
     families_per_day: Mapping[Day, Collection[Family]],
     days: Iterable[Day],
+    config: SolverConfig = DEFAULT_CONFIG,
+    capacity: Capacity = DEFAULT_CAPACITY,
 ) -> Solution:
 
-    solution, unassigned_families = _naive_assign(families, days)
+    solution, unassigned_families = _naive_assign(
+        families, days, config, capacity
+    )
 
     solution = _fix_minimum_occupancy_infeasibility(
         solution=solution,
         families_per_day=families_per_day,
+        capacity=capacity,
     )
 
     solution = _process_unassigned_families(
         solution=solution,
         unassigned_families=unassigned_families,
+        capacity=capacity,
     )
 
     return solution
@@ -184,10 +250,12 @@ def _is_feasible_swap(
     number_of_members: int,
     origin_day_occupancy: int,
     target_day_occupancy: Day,
+    capacity: Capacity = DEFAULT_CAPACITY,
 ) -> bool:
     return not is_capacity_infeasible(
         [origin_day_occupancy - number_of_members]
-        + [target_day_occupancy + number_of_members]
+        + [target_day_occupancy + number_of_members],
+        capacity,
     )
 
 
@@ -195,7 +263,7 @@ def _is_beneficial(
     family: Family,
     current_day: Day,
     prospective_day: Day,
-    occupancies: Occupancies,
+    occupancies: OccupanciesMutable,
 ) -> bool:
     # Calculate change in preference cost
     pref_cost = partial(
@@ -217,14 +285,14 @@ def _is_beneficial(
     current_accounting_cost = accounting_cost_of_daily_occupancy(
         occupancies, days
     )
-    new_occupancies = _apply_occupancy_change(
-        dict(occupancies),
-        current_day,
-        prospective_day,
-        family.number_of_members,
+    # Apply the move in place and revert it, copying the occupancies would
+    # cost a pass over the whole horizon for every evaluated move.
+    _apply_occupancy_change(
+        occupancies, current_day, prospective_day, family.number_of_members
     )
-    new_accounting_cost = accounting_cost_of_daily_occupancy(
-        new_occupancies, days
+    new_accounting_cost = accounting_cost_of_daily_occupancy(occupancies, days)
+    _apply_occupancy_change(
+        occupancies, prospective_day, current_day, family.number_of_members
     )
     accounting_cost_change = new_accounting_cost - current_accounting_cost
 
@@ -249,21 +317,35 @@ def _run_naive_improvement(
     solution: Solution,
     families: Collection[Family],
     days: Iterable[Day],
-) -> Solution:
+    restrict_to_days: Optional[AbstractSet[Day]] = None,
+    deadline: Deadline = NO_DEADLINE,
+    capacity: Capacity = DEFAULT_CAPACITY,
+) -> Tuple[Solution, int]:
     family_index = {f.id: f for f in families}
     current_assignments = dict(solution.assignments)
     current_occupancies = dict(solution.daily_occupancy)
+    evaluated_moves = 0
 
     for family_id, assigned_day in solution.assignments.items():
+        if deadline.expired():
+            break
         family = family_index[family_id]
         assigned_choice = choice(family.choice_index, assigned_day)
         if assigned_choice > 0:
             for candidate_choice in range(assigned_choice):
                 new_day = family.choices[candidate_choice]
+                if (
+                    restrict_to_days is not None
+                    and assigned_day not in restrict_to_days
+                    and new_day not in restrict_to_days
+                ):
+                    continue
+                evaluated_moves += 1
                 if _is_feasible_swap(
                     family.number_of_members,
                     current_occupancies[assigned_day],
                     current_occupancies[new_day],
+                    capacity,
                 ) and _is_beneficial(
                     family, assigned_day, new_day, current_occupancies
                 ):
@@ -274,7 +356,92 @@ def _run_naive_improvement(
                         new_day,
                     )
 
-    return Solution.from_assignments(current_assignments, days, family_index)
+    return (
+        Solution.from_assignments(current_assignments, days, family_index),
+        evaluated_moves,
+    )
+
+
+def _progress_callback(
+    events: EventStream, interval: float = 1.0
+) -> Callable[[grb.Model, int], None]:
+    last = {"published": time.perf_counter(), "nodes": 0.0}
+
+    def callback(model: grb.Model, where: int) -> None:
+        if where == GRB.Callback.MIPSOL:
+            events.publish(
+                "mip",
+                incumbent=model.cbGet(GRB.Callback.MIPSOL_OBJ),
+                bound=model.cbGet(GRB.Callback.MIPSOL_OBJBND),
+            )
+        elif where == GRB.Callback.MIP:
+            now = time.perf_counter()
+            elapsed = now - last["published"]
+            if elapsed < interval:
+                return
+            nodes = model.cbGet(GRB.Callback.MIP_NODCNT)
+            incumbent = model.cbGet(GRB.Callback.MIP_OBJBST)
+            events.publish(
+                "mip",
+                incumbent=incumbent if incumbent < GRB.INFINITY else None,
+                bound=model.cbGet(GRB.Callback.MIP_OBJBND),
+                moves_per_second=(nodes - last["nodes"]) / elapsed,
+            )
+            last["published"], last["nodes"] = now, nodes
+
+    return callback
+
+
+def _sharing_callback(
+    shared: SharedIncumbent,
+    assignment_vars: grb.tupledict,
+    occupancy_vars: grb.tupledict,
+    family_index: Mapping[FamilyID, Family],
+    days: Iterable[Day],
+) -> Callable[[grb.Model, int], None]:
+    # Publishes every MIP solution to the other engines, injects better
+    # solutions they found and stops once the bound proves the incumbent.
+    keys = list(assignment_vars.keys())
+    variables = [assignment_vars[k] for k in keys]
+    seen = {"version": shared.version()}
+
+    def callback(model: grb.Model, where: int) -> None:
+        if where == GRB.Callback.MIPSOL:
+            values = model.cbGetSolution(variables)
+            shared.offer(
+                {k[0]: k[1] for k, v in zip(keys, values) if v > 0.5},
+                model.cbGet(GRB.Callback.MIPSOL_OBJ),
+                "mip",
+            )
+            seen["version"] = shared.version()
+        elif where == GRB.Callback.MIP:
+            bound = model.cbGet(GRB.Callback.MIP_OBJBND)
+            if bound >= shared.cost() - _EPSILON:
+                shared.prove(bound, "mip")
+                model.terminate()
+        elif where == GRB.Callback.MIPNODE:
+            if shared.version() == seen["version"]:
+                return
+            seen["version"] = shared.version()
+            best = shared.best()
+            if best is None or best[0] >= model.cbGet(
+                GRB.Callback.MIPNODE_OBJBST
+            ):
+                return
+            solution = Solution.from_assignments(best[1], days, family_index)
+            model.cbSetSolution(
+                variables, [float(best[1][f] == d) for f, d in keys]
+            )
+            model.cbSetSolution(
+                list(occupancy_vars.values()),
+                [
+                    float(solution.daily_occupancy[d] == o)
+                    for o, d in occupancy_vars.keys()
+                ],
+            )
+            model.cbUseSolution()
+
+    return callback
 
 
 def _optimize(
@@ -282,14 +449,35 @@ def _optimize(
     days: Iterable[Day],
     family_index: Mapping[FamilyID, Family],
     mip_start: Optional[Assignments],
-) -> Solution:
+    time_limit: Optional[float] = None,
+    events: EventStream = NO_EVENTS,
+    deadline: Deadline = NO_DEADLINE,
+    capacity: Capacity = DEFAULT_CAPACITY,
+    shared: Optional[SharedIncumbent] = None,
+    domains: Optional[Domains] = None,
+    reduced_cost_fixing: bool = False,
+    threads: Optional[int] = None,
+) -> Optional[Solution]:
+    days = list(days)
+    domains = domains or full_domains(families, days, capacity)
+    occupancies = capacity.occupancies()
+    family_day_index: Dict[Day, List[Family]] = {day: [] for day in days}
+    for family in families:
+        for family_choice in domains.choices[family.id]:
+            family_day_index[family_choice].append(family)
+
+    events.publish("build")
     with gurobi.model("santa-19") as model:
+        if time_limit is not None:
+            model.setParam("TimeLimit", time_limit)
+        if threads is not None:
+            model.setParam("Threads", threads)
 
         assignment_vars = model.addVars(
             tuplelist(
                 (family.id, family_choice)
                 for family in families
-                for family_choice in family.choices
+                for family_choice in domains.choices[family.id]
             ),
             name="x",
             vtype=GRB.BINARY,
@@ -298,27 +486,54 @@ def _optimize(
             tuplelist(
                 (occupancy, day)
                 for day in days
-                for occupancy in _FEASIBLE_OCCUPANCIES
+                for occupancy in domains.occupancies[day]
             ),
             name="delta",
             vtype=GRB.BINARY,
         )
-        occupancy_pairs = {
-            (o, o_p, d): accounting_cost(o, o_p)
-            for o in _FEASIBLE_OCCUPANCIES
-            for o_p in _FEASIBLE_OCCUPANCIES
-            for d in days
+        # The accounting cost only depends on the occupancy pair, not on the
+        # day. The last day is paired with itself.
+        # Pairs too far apart to evaluate are dropped.
+        pair_costs = {
+            pair: cost
+            for pair, cost in (
+                ((o, o_p), accounting_cost(o, o_p))
+                for o in occupancies
+                for o_p in occupancies
+            )
+            if math.isfinite(cost)
         }
         occupancy_pair_vars = model.addVars(
-            occupancy_pairs.keys(), name="phi", lb=0, ub=1
+            tuplelist(
+                chain(
+                    (
+                        (o, o_p, d)
+                        for d, d_next in zip(days, days[1:])
+                        for o in domains.occupancies[d]
+                        for o_p in domains.occupancies[d_next]
+                        if (o, o_p) in pair_costs
+                        and pair_costs[(o, o_p)] <= domains.pair_budget[d]
+                    ),
+                    (
+                        (o, o, days[-1])
+                        for o in domains.occupancies[days[-1]]
+                        if pair_costs[(o, o)] <= domains.pair_budget[days[-1]]
+                    ),
+                )
+            ),
+            name="phi",
+            lb=0,
+            ub=1,
         )
         logger.info("Created variables")
+        if deadline.expired():
+            return None
 
         model.addConstrs(
             (
                 quicksum(
                     assignment_vars[(family_id, family_choice)]
-                    for family_choice in family_index[family_id].choices
+                    for family_choice in domains.choices[family_id]
                 )
                 == 1
                 for family_id in family_index.keys()
@@ -331,42 +546,42 @@ def _optimize(
         model.addConstrs(
             (
                 quicksum(
-                    assignment_vars.get((family.id, day), 0)
+                    assignment_vars[(family.id, day)]
                     * family.number_of_members
-                    for family in families
+                    for family in family_day_index[day]
                 )
                 == quicksum(
                     occupancy_vars[(occupancy, day)] * occupancy
-                    for occupancy in _FEASIBLE_OCCUPANCIES
+                    for occupancy in domains.occupancies[day]
                 )
                 for day in days
             ),
             name="occ",
         )
 
-        n_days = len(list(days))
         model.addConstrs(
             (
                 occupancy_pair_vars.sum(occupancy, "*", d)
                 == occupancy_vars[(occupancy, d)]
-                for occupancy in _FEASIBLE_OCCUPANCIES
                 for d in days
+                for occupancy in domains.occupancies[d]
             ),
             name="occ_l_1",
         )
 
         model.addConstrs(
             (
-                occupancy_pair_vars.sum("*", occupancy, d + 1)
-                == occupancy_vars[(occupancy, d + 1)]
-                for occupancy in _FEASIBLE_OCCUPANCIES
-                for d in days
-                if d + 1 < n_days
+                occupancy_pair_vars.sum("*", occupancy, d)
+                == occupancy_vars[(occupancy, d_next)]
+                for d, d_next in zip(days, days[1:])
+                for occupancy in domains.occupancies[d_next]
             ),
             name="occ_l_2",
         )
 
         logger.info("Set constraints")
+        if deadline.expired():
+            return None
 
         pref_cost_expr = quicksum(
             assignment_vars[(family.id, family_choice)]
@@ -374,11 +589,11 @@ def _optimize(
                 family_choice, family.choice_index, family.number_of_members
             )
             for family in families
-            for family_choice in family.choices
+            for family_choice in domains.choices[family.id]
         )
         accounting_cost_expr = quicksum(
-            occupancy_vars.sum(pair[0], pair[1], "*") * cost
-            for pair, cost in occupancy_pairs.items()
+            var * pair_costs[(o, o_p)]
+            for (o, o_p, _), var in occupancy_pair_vars.items()
         )
 
         model.setObjective(
@@ -386,44 +601,377 @@ def _optimize(
         )
         logger.info("Set objective")
 
+        if reduced_cost_fixing:
+            upper_bound = domains.upper_bound
+            if shared is not None:
+                upper_bound = min(upper_bound, shared.cost())
+            if upper_bound < math.inf:
+                fix_by_reduced_costs(
+                    model,
+                    list(assignment_vars.values())
+                    + list(occupancy_vars.values()),
+                    upper_bound,
+                    deadline,
+                )
+
         if mip_start:
             for family_id, assigned_day in mip_start.items():
                 v = assignment_vars.get((family_id, assigned_day), None)
                 if v:
                     v.start = 1
 
-        model.optimize()
+        remaining = deadline.remaining()
+        if remaining is not None:
+            if remaining <= 0.0:
+                return None
+            model.setParam(
+                "TimeLimit",
+                (
+                    remaining
+                    if time_limit is None
+                    else min(time_limit, remaining)
+                ),
+            )
+
+        callbacks = [
+            gurobi.terminate_callback(deadline),
+            _progress_callback(events),
+        ]
+        if shared is not None:
+            # Nodes that cannot beat the best solution of any engine are
+            # pruned.
+            model.setParam("Cutoff", shared.cost())
+            callbacks.append(
+                _sharing_callback(
+                    shared,
+                    assignment_vars,
+                    occupancy_vars,
+                    family_index,
+                    days,
+                )
+            )
+
+        def callback(model: grb.Model, where: int) -> None:
+            for c in callbacks:
+                c(model, where)
 
+        model.optimize(callback)
+
+        # Optimal only within the MIP gap, which proves the shared incumbent
+        # only when the bound reaches it; or nothing better than the cutoff.
+        if (
+            shared is not None
+            and model.status == GRB.OPTIMAL
+            and model.ObjBound >= shared.cost() - _EPSILON
+        ):
+            shared.prove(model.ObjBound, "mip")
+        elif shared is not None and model.status == GRB.CUTOFF:
+            shared.prove(shared.cost(), "mip")
         if model.status == GRB.INFEASIBLE:
             model.computeIIS()
-            model.write("conflict.lp")
-            raise Exception("Infeasible model.")
+            # Per solve, concurrent tune, batch and portfolio processes
+            # would overwrite a fixed file.
+            fd, conflict = tempfile.mkstemp(
+                prefix="santa-19-conflict-", suffix=".ilp"
+            )
+            os.close(fd)
+            model.write(conflict)
+            raise Exception(f"Infeasible model, conflict in {conflict}.")
+        elif model.SolCount == 0:
+            logger.warning("MIP found no solution before stopping.")
+            return None
         else:
             assignments = {
                 k[0]: k[1] for k, v in assignment_vars.items() if v.X > 0.5
             }
-            model.write("sol.sol")
             return Solution.from_assignments(assignments, days, family_index)
 
 
-def solve(
+def _improve_until_stable(
+    solution: Solution,
     families: Collection[Family],
-    families_per_day: Mapping[Day, Collection[Family]],
     family_index: Mapping[FamilyID, Family],
     days: Iterable[Day],
+    restrict_to_days: Optional[AbstractSet[Day]] = None,
+    max_passes: Optional[int] = None,
+    events: EventStream = NO_EVENTS,
+    deadline: Deadline = NO_DEADLINE,
+    capacity: Capacity = DEFAULT_CAPACITY,
 ) -> Solution:
-    solution = _construct_solution(families, families_per_day, days)
     current_result = evaluate(solution, family_index, days)
-    logger.info(
-        f"Constructed initial solution: {current_result.total_cost()}."
-    )
-    while True:
-        solution = _run_naive_improvement(solution, families, days)
+    passes = 0
+    while (max_passes is None or passes < max_passes) and not (
+        deadline.expired()
+    ):
+        passes += 1
+        start = time.perf_counter()
+        solution, evaluated_moves = _run_naive_improvement(
+            solution, families, days, restrict_to_days, deadline, capacity
+        )
         result = evaluate(solution, family_index, days)
+        events.publish(
+            "improve",
+            incumbent=result.total_cost(),
+            moves_per_second=evaluated_moves
+            / max(time.perf_counter() - start, 1e-9),
+        )
         if result != current_result:
             current_result = result
             logger.info(f"Improved solution: {current_result.total_cost()}.")
             continue
         break
 
-    return _optimize(families, days, family_index, solution.assignments)
+    return solution
+
+
+def _touched_days(
+    base: Occupancies,
+    repaired: Occupancies,
+    days: Iterable[Day],
+) -> AbstractSet[Day]:
+    changed = {day for day in days if base.get(day) != repaired[day]}
+    return frozenset(
+        neighbour
+        for day in changed
+        for neighbour in (day - 1, day, day + 1)
+        if neighbour in repaired
+    )
+
+
+def _occupancy_pair_candidates(domains: Domains, days: Iterable[Day]) -> int:
+    days = list(days)
+    return sum(
+        len(domains.occupancies[d]) * len(domains.occupancies[d_next])
+        for d, d_next in zip(days, days[1:])
+    ) + len(domains.occupancies[days[-1]])
+
+
+def improve(
+    solution: Solution,
+    families: Collection[Family],
+    family_index: Mapping[FamilyID, Family],
+    days: Iterable[Day],
+    config: SolverConfig = DEFAULT_CONFIG,
+    events: EventStream = NO_EVENTS,
+    deadline: Deadline = NO_DEADLINE,
+    capacity: Capacity = DEFAULT_CAPACITY,
+) -> Solution:
+    if config.improvement == "batch":
+        solution = batch_improvement(
+            solution,
+            family_index,
+            days,
+            max_rounds=config.max_improvement_passes,
+            events=events,
+            deadline=deadline,
+            capacity=capacity,
+        )
+    else:
+        solution = _improve_until_stable(
+            solution,
+            families,
+            family_index,
+            days,
+            max_passes=config.max_improvement_passes,
+            events=events,
+            deadline=deadline,
+            capacity=capacity,
+        )
+    if config.improvement == "guided":
+        solution = guided_local_search(
+            solution,
+            family_index,
+            days,
+            iterations=config.guided_iterations,
+            events=events,
+            deadline=deadline,
+            capacity=capacity,
+        )
+    return solution
+
+
+def solve(
+    families: Collection[Family],
+    families_per_day: Mapping[Day, Collection[Family]],
+    family_index: Mapping[FamilyID, Family],
+    days: Iterable[Day],
+    config: SolverConfig = DEFAULT_CONFIG,
+    events: EventStream = NO_EVENTS,
+    deadline: Deadline = NO_DEADLINE,
+    capacity: Capacity = DEFAULT_CAPACITY,
+    shared: Optional[SharedIncumbent] = None,
+) -> Solution:
+    # Construction always runs to completion, it is the fallback every later
+    # phase improves on when the deadline passes or the solve is cancelled.
+    events.publish("construct")
+    solution = _construct_solution(
+        families, families_per_day, days, config, capacity
+    )
+    current_result = evaluate(solution, family_index, days)
+    logger.info(
+        f"Constructed initial solution: {current_result.total_cost()}."
+    )
+    events.publish("construct", incumbent=current_result.total_cost())
+    solution = improve(
+        solution,
+        families,
+        family_index,
+        days,
+        config,
+        events,
+        deadline,
+        capacity,
+    )
+    engine = config.engine if config.use_mip else config.improvement
+    if shared is not None:
+        # Continue from the best solution of all engines if another one is
+        # ahead.
+        solution, _ = shared.exchange(
+            solution,
+            evaluate(solution, family_index, days).total_cost(),
+            engine,
+            family_index,
+            days,
+        )
+    if config.use_mip and config.engine == "colgen" and not deadline.expired():
+        colgen_result = column_generation(
+            solution,
+            families,
+            family_index,
+            list(days),
+            time_limit=config.mip_time_limit,
+            events=events,
+            deadline=deadline,
+            capacity=capacity,
+            shared=shared,
+            threads=config.threads,
+        )
+        logger.info(f"Column generation bound: {colgen_result.lower_bound}")
+        mip_solution = colgen_result.solution
+    elif config.use_mip and not deadline.expired():
+        upper_bound = evaluate(solution, family_index, days).total_cost()
+        domains = (
+            presolve(families, days, upper_bound, capacity)
+            if config.presolve
+            else full_domains(families, days, capacity, upper_bound)
+        )
+        candidate_pairs = _occupancy_pair_candidates(domains, days)
+        if candidate_pairs > MAX_MIP_OCCUPANCY_PAIRS:
+            logger.warning(
+                f"Skipping the MIP: {candidate_pairs} occupancy pair "
+                f"candidates exceed {MAX_MIP_OCCUPANCY_PAIRS}"
+            )
+            mip_solution = None
+        else:
+            mip_solution = _optimize(
+                families,
+                days,
+                family_index,
+                solution.assignments if config.warm_start else None,
+                config.mip_time_limit,
+                events,
+                deadline,
+                capacity,
+                shared,
+                domains,
+                config.reduced_cost_fixing,
+                config.threads,
+            )
+    else:
+        mip_solution = None
+    if mip_solution is not None and (
+        evaluate(mip_solution, family_index, days).total_cost()
+        <= evaluate(solution, family_index, days).total_cost()
+    ):
+        solution = mip_solution
+    if shared is not None:
+        shared.offer(
+            solution.assignments,
+            evaluate(solution, family_index, days).total_cost(),
+            engine,
+        )
+
+    if deadline.expired():
+        logger.warning("Stopped before completing all phases.")
+    events.publish(
+        "done", incumbent=evaluate(solution, family_index, days).total_cost()
+    )
+    return solution
+
+
+def reoptimize(
+    base: Solution,
+    base_family_index: Mapping[FamilyID, Family],
+    diff: FamilyDiff,
+    families: Collection[Family],
+    families_per_day: Mapping[Day, Collection[Family]],
+    family_index: Mapping[FamilyID, Family],
+    days: Iterable[Day],
+    deadline: Deadline = NO_DEADLINE,
+    capacity: Capacity = DEFAULT_CAPACITY,
+) -> Solution:
+    assignments = {
+        family_id: day
+        for family_id, day in base.assignments.items()
+        if family_id in family_index
+    }
+    for family_id in diff.changed:
+        # Families keep their day unless it is no longer among their choices
+        # or their size changed, which could break the day's capacity.
+        # A changed family missing from the base solution is unassigned.
+        family = family_index[family_id]
+        if (
+            assignments.get(family_id) not in family.choice_index
+            or family.number_of_members
+            != base_family_index[family_id].number_of_members
+        ):
+            assignments.pop(family_id, None)
+
+    solution = Solution.from_assignments(assignments, days, family_index)
+    solution = _process_unassigned_families(
+        solution=solution,
+        unassigned_families=[
+            family_index[family_id]
+            for family_id in family_index.keys()
+            if family_id not in assignments
+        ],
+        capacity=capacity,
+    )
+    solution = Solution.from_assignments(
+        solution.assignments, days, family_index
+    )
+    solution = _fix_minimum_occupancy_infeasibility(
+        solution=solution,
+        families_per_day=families_per_day,
+        capacity=capacity,
+    )
+
+    # Families whose choices changed may keep their day without changing
+    # any occupancy, so their old day and new choices are searched too.
+    touched_days = _touched_days(
+        base.daily_occupancy, solution.daily_occupancy, days
+    ) | {
+        day
+        for family_id in chain(diff.added, diff.changed)
+        for day in chain(
+            family_index[family_id].choices,
+            (
+                [base.assignments[family_id]]
+                if family_id in base.assignments
+                else []
+            ),
+        )
+    }
+    logger.info(
+        f"Repaired {len(diff.added) + len(diff.changed)} families, "
+        f"searching {len(touched_days)} touched days."
+    )
+    return _improve_until_stable(
+        solution,
+        families,
+        family_index,
+        days,
+        touched_days,
+        deadline=deadline,
+        capacity=capacity,
+    )
@@ -0,0 +1,216 @@
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from functools import partial
+from itertools import product
+from pathlib import Path
+from statistics import mean
+from typing import (
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+)
+
+from santa_19.config import (
+    CHOICE_ORDERS,
+    ENGINES,
+    FAMILY_ORDERS,
+    IMPROVEMENTS,
+    SolverConfig,
+)
+from santa_19.inputs import Day, Family, families_per_day, parse_csv
+from santa_19.parameters import DAYS, DEFAULT_CAPACITY, Capacity
+from santa_19.result import evaluate
+from santa_19.solution import is_feasible
+from santa_19.solver import solve
+
+logger = logging.getLogger(__name__)
+
+TUNING_SPACE: Mapping[str, Sequence[Any]] = {
+    "family_order": FAMILY_ORDERS,
+    "choice_order": CHOICE_ORDERS,
+    "max_improvement_passes": (1, 5, None),
+    "improvement": IMPROVEMENTS,
+    "use_mip": (False, True),
+    "engine": ENGINES,
+    "presolve": (True, False),
+    "reduced_cost_fixing": (False, True),
+    "mip_time_limit": (60.0, 300.0),
+    "warm_start": (True, False),
+}
+
+
+@dataclass(frozen=True)
+class TuningRecord:
+    config: SolverConfig
+    instance: str
+    total_cost: Optional[float]
+    seconds: float
+
+
+@dataclass(frozen=True)
+class ConfigSummary:
+    config: SolverConfig
+    mean_cost: Optional[float]
+    max_cost: Optional[float]
+    mean_seconds: float
+    failures: int
+
+
+def _normalized(config: SolverConfig) -> SolverConfig:
+    # MIP settings are irrelevant when the MIP is skipped, and column
+    # generation ignores those of the compact MIP; collapse them so the
+    # same effective configuration is not run several times.
+    if config.use_mip and config.engine == "colgen":
+        return replace(
+            config,
+            presolve=SolverConfig.presolve,
+            reduced_cost_fixing=SolverConfig.reduced_cost_fixing,
+            warm_start=SolverConfig.warm_start,
+        )
+    if config.use_mip:
+        return config
+    return replace(
+        config,
+        engine=SolverConfig.engine,
+        presolve=SolverConfig.presolve,
+        reduced_cost_fixing=SolverConfig.reduced_cost_fixing,
+        mip_time_limit=SolverConfig.mip_time_limit,
+        warm_start=SolverConfig.warm_start,
+    )
+
+
+def grid_configs(
+    space: Mapping[str, Sequence[Any]] = TUNING_SPACE,
+) -> List[SolverConfig]:
+    configs = {
+        _normalized(SolverConfig(**dict(zip(space.keys(), values))))
+        for values in product(*space.values())
+    }
+    return sorted(configs, key=repr)
+
+
+def random_configs(
+    samples: int,
+    seed: int,
+    space: Mapping[str, Sequence[Any]] = TUNING_SPACE,
+) -> List[SolverConfig]:
+    configs = grid_configs(space)
+    return random.Random(seed).sample(configs, min(samples, len(configs)))
+
+
+def _run_instance(
+    config: SolverConfig,
+    instance: str,
+    days: Sequence[Day] = DAYS,
+    capacity: Capacity = DEFAULT_CAPACITY,
+    threads: Optional[int] = None,
+) -> TuningRecord:
+    families = list(parse_csv(Path(instance), Family.parse))
+    family_index = {f.id: f for f in families}
+
+    start = time.perf_counter()
+    try:
+        solution = solve(
+            families,
+            families_per_day(families, days),
+            family_index,
+            days,
+            replace(config, threads=threads or config.threads),
+            capacity=capacity,
+        )
+    except Exception:
+        logger.exception(f"Solve failed for {instance} with {config}")
+        return TuningRecord(
+            config, instance, None, time.perf_counter() - start
+        )
+    seconds = time.perf_counter() - start
+
+    if not is_feasible(solution, family_index, capacity):
+        return TuningRecord(config, instance, None, seconds)
+    return TuningRecord(
+        config,
+        instance,
+        evaluate(solution, family_index, days).total_cost(),
+        seconds,
+    )
+
+
+def tune(
+    configs: Collection[SolverConfig],
+    instances: Collection[str],
+    workers: Optional[int] = None,
+    days: Sequence[Day] = DAYS,
+    capacity: Capacity = DEFAULT_CAPACITY,
+) -> List[TuningRecord]:
+    jobs = list(product(configs, instances))
+    cpus = os.cpu_count() or 1
+    workers = workers or cpus
+    # Concurrent solves share the cores instead of each using all of them,
+    # so their runtimes stay comparable.
+    threads = max(cpus // workers, 1)
+    logger.info(
+        f"Running {len(jobs)} tuning jobs on {workers} workers with "
+        f"{threads} solver threads each"
+    )
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(
+            pool.map(
+                partial(
+                    _run_instance,
+                    days=days,
+                    capacity=capacity,
+                    threads=threads,
+                ),
+                [config for config, _ in jobs],
+                [instance for _, instance in jobs],
+            )
+        )
+
+
+def summarize(records: Iterable[TuningRecord]) -> List[ConfigSummary]:
+    per_config: Dict[SolverConfig, List[TuningRecord]] = {}
+    for record in records:
+        per_config.setdefault(record.config, []).append(record)
+
+    summaries = []
+    for config, config_records in per_config.items():
+        costs = [
+            r.total_cost for r in config_records if r.total_cost is not None
+        ]
+        failures = len(config_records) - len(costs)
+        summaries.append(
+            ConfigSummary(
+                config=config,
+                mean_cost=mean(costs) if costs and not failures else None,
+                max_cost=max(costs) if costs and not failures else None,
+                mean_seconds=mean(r.seconds for r in config_records),
+                failures=failures,
+            )
+        )
+
+    return sorted(
+        summaries,
+        key=lambda s: (
+            s.mean_cost is None,
+            s.mean_cost or 0.0,
+            s.mean_seconds,
+        ),
+    )
+
+
+def fastest_reaching(
+    summaries: Iterable[ConfigSummary], target: float
+) -> Optional[ConfigSummary]:
+    reaching = [
+        s for s in summaries if s.max_cost is not None and s.max_cost <= target
+    ]
+    return min(reaching, key=lambda s: s.mean_seconds, default=None)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Collection, Iterable, Mapping, Optional, Set
+
+import numpy as np
+
+from santa_19.costs import accounting_cost, preference_cost
+from santa_19.deadline import NO_DEADLINE, Deadline
+from santa_19.events import NO_EVENTS, EventStream
+from santa_19.inputs import Day, Family
+from santa_19.parameters import DEFAULT_CAPACITY, Capacity
+from santa_19.solution import Solution
+from santa_19.typing import FamilyID
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FamilyArrays:
+    ids: np.ndarray
+    sizes: np.ndarray
+    choices: np.ndarray
+    preference: np.ndarray
+    unrelated_preference: np.ndarray
+
+    @staticmethod
+    def from_families(families: Collection[Family]) -> FamilyArrays:
+        families = sorted(families, key=lambda f: f.id)
+        return FamilyArrays(
+            ids=np.array([f.id for f in families]),
+            sizes=np.array([f.number_of_members for f in families]),
+            choices=np.array([f.choices for f in families]),
+            preference=np.array(
+                [
+                    [
+                        preference_cost(
+                            day, f.choice_index, f.number_of_members
+                        )
+                        for day in f.choices
+                    ]
+                    for f in families
+                ]
+            ),
+            unrelated_preference=np.array(
+                [preference_cost(0, {}, f.number_of_members) for f in families]
+            ),
+        )
+
+    def assigned_preference(self, assigned: np.ndarray) -> np.ndarray:
+        match = self.choices == assigned[:, None]
+        return np.where(
+            match.any(axis=1),
+            (self.preference * match).sum(axis=1),
+            self.unrelated_preference,
+        )
+
+
+@dataclass(frozen=True)
+class BestMoves:
+    rows: np.ndarray
+    from_days: np.ndarray
+    to_days: np.ndarray
+    deltas: np.ndarray
+
+
+def accounting_terms(occupancy: np.ndarray) -> np.ndarray:
+    # occupancy is indexed by day, index 0 is unused; the last day is paired
+    # with itself like in accounting_cost_of_daily_occupancy.
+    next_occupancy = np.append(occupancy[2:], occupancy[-1])
+    terms = np.zeros(len(occupancy))
+    terms[1:] = accounting_cost(occupancy[1:], next_occupancy)
+    return terms
+
+
+def best_moves(
+    arrays: FamilyArrays,
+    assigned: np.ndarray,
+    occupancy: np.ndarray,
+    capacity: Capacity = DEFAULT_CAPACITY,
+) -> BestMoves:
+    # Evaluates moving every family to each of its choices in one pass and
+    # keeps the best improving, capacity-feasible move per family.
+    n_days = len(occupancy) - 1
+    occupancy = occupancy.astype(float)
+    sizes = arrays.sizes[:, None]
+    from_days = np.broadcast_to(assigned[:, None], arrays.choices.shape)
+    to_days = arrays.choices
+
+    # Accounting terms of days d-1 and d change when the occupancy of d
+    # changes; drop terms outside the horizon and terms counted twice.
+    term_days = np.stack(
+        [from_days - 1, from_days, to_days - 1, to_days], axis=-1
+    )
+    valid = term_days >= 1
+    for k in range(1, term_days.shape[-1]):
+        for j in range(k):
+            valid[..., k] &= term_days[..., k] != term_days[..., j]
+    term_days = np.clip(term_days, 1, n_days)
+    next_days = np.minimum(term_days + 1, n_days)
+
+    def _moved(days: np.ndarray) -> np.ndarray:
+        return (
+            occupancy[days]
+            - sizes[..., None] * (days == from_days[..., None])
+            + sizes[..., None] * (days == to_days[..., None])
+        )
+
+    new_terms = accounting_cost(_moved(term_days), _moved(next_days))
+    old_terms = accounting_terms(occupancy)[term_days]
+    accounting_delta = ((new_terms - old_terms) * valid).sum(axis=-1)
+
+    preference_delta = (
+        arrays.preference - arrays.assigned_preference(assigned)[:, None]
+    )
+
+    feasible = (
+        (to_days != from_days)
+        & (occupancy[from_days] - sizes >= capacity.minimum)
+        & (occupancy[to_days] + sizes <= capacity.maximum)
+    )
+    deltas = np.where(feasible, accounting_delta + preference_delta, np.inf)
+
+    best = deltas.argmin(axis=1)
+    rows = np.arange(len(assigned))
+    best_deltas = deltas[rows, best]
+    improving = best_deltas < -1e-9
+    return BestMoves(
+        rows=rows[improving],
+        from_days=assigned[improving],
+        to_days=to_days[rows, best][improving],
+        deltas=best_deltas[improving],
+    )
+
+
+def non_conflicting(moves: BestMoves) -> np.ndarray:
+    # Moves whose changed days are at least two days apart do not interact,
+    # so their deltas stay exact when they are applied together.
+    blocked: Set[int] = set()
+    selected = []
+    for i in np.argsort(moves.deltas, kind="stable"):
+        from_day, to_day = int(moves.from_days[i]), int(moves.to_days[i])
+        if from_day in blocked or to_day in blocked:
+            continue
+        selected.append(i)
+        for day in (from_day, to_day):
+            blocked.update((day - 1, day, day + 1))
+    return np.array(selected, dtype=int)
+
+
+def batch_improvement(
+    solution: Solution,
+    family_index: Mapping[FamilyID, Family],
+    days: Iterable[Day],
+    max_rounds: Optional[int] = None,
+    events: EventStream = NO_EVENTS,
+    deadline: Deadline = NO_DEADLINE,
+    capacity: Capacity = DEFAULT_CAPACITY,
+) -> Solution:
+    days = list(days)
+    arrays = FamilyArrays.from_families(family_index.values())
+    assigned = np.array(
+        [solution.assignments[family_id] for family_id in arrays.ids]
+    )
+    occupancy = np.zeros(max(days) + 1, dtype=int)
+    np.add.at(occupancy, assigned, arrays.sizes)
+
+    rounds = 0
+    while (max_rounds is None or rounds < max_rounds) and not (
+        deadline.expired()
+    ):
+        rounds += 1
+        start = time.perf_counter()
+        moves = best_moves(arrays, assigned, occupancy, capacity)
+        if not len(moves.rows):
+            break
+        selected = non_conflicting(moves)
+        rows = moves.rows[selected]
+        np.add.at(occupancy, moves.from_days[selected], -arrays.sizes[rows])
+        np.add.at(occupancy, moves.to_days[selected], arrays.sizes[rows])
+        assigned[rows] = moves.to_days[selected]
+
+        improvement = moves.deltas[selected].sum()
+        logger.info(
+            f"Applied {len(selected)} of {len(moves.rows)} improving moves "
+            f"({improvement:.2f})."
+        )
+        events.publish(
+            "batch",
+            incumbent=arrays.assigned_preference(assigned).sum()
+            + accounting_terms(occupancy.astype(float)).sum(),
+            moves_per_second=arrays.choices.size
+            / max(time.perf_counter() - start, 1e-9),
+        )
+
+    return Solution.from_assignments(
+        dict(zip(arrays.ids.tolist(), assigned.tolist())), days, family_index
+    )
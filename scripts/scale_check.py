@@ -0,0 +1,85 @@
+"""Solve a generated instance under an address space limit and report the
+runtime, cost and peak memory, e.g. for the 100k-family, 365-day instance:
+
+    python scripts/scale_check.py --memory-limit 1500
+"""
+
+import logging
+import resource
+import time
+from dataclasses import replace
+
+import click
+
+from santa_19.config import DEFAULT_CONFIG, IMPROVEMENTS
+from santa_19.inputs import families_per_day, generate_families
+from santa_19.parameters import Capacity, horizon
+from santa_19.result import evaluate
+from santa_19.solution import is_feasible
+from santa_19.solver import solve
+
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option("--families", "n_families", default=100_000, show_default=True)
+@click.option("--days", default=365, show_default=True)
+@click.option("--min-occupancy", default=1000, show_default=True)
+@click.option("--max-occupancy", default=1800, show_default=True)
+@click.option(
+    "--improvement",
+    type=click.Choice(IMPROVEMENTS),
+    default=DEFAULT_CONFIG.improvement,
+    show_default=True,
+)
+@click.option(
+    "--memory-limit",
+    type=int,
+    default=1500,
+    show_default=True,
+    help="Address space limit in MB.",
+)
+@click.option("--seed", default=0, show_default=True)
+def main(
+    n_families: int,
+    days: int,
+    min_occupancy: int,
+    max_occupancy: int,
+    improvement: str,
+    memory_limit: int,
+    seed: int,
+) -> None:
+    limit = memory_limit * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    planning_days = horizon(days)
+    capacity = Capacity(min_occupancy, max_occupancy)
+    families = generate_families(n_families, planning_days, seed=seed)
+    family_index = {f.id: f for f in families}
+
+    start = time.perf_counter()
+    # The default configuration, i.e. including presolve and the MIP, which
+    # is skipped when the instance has too many occupancy pairs.
+    solution = solve(
+        families,
+        families_per_day(families, planning_days),
+        family_index,
+        planning_days,
+        replace(DEFAULT_CONFIG, improvement=improvement),
+        capacity=capacity,
+    )
+    seconds = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    click.echo(
+        f"feasible: {is_feasible(solution, family_index, capacity)}, "
+        f"cost: {evaluate(solution, family_index, planning_days).total_cost()}"
+        f", seconds: {seconds:.1f}, peak RSS: {peak:.0f} MB"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] [%(name)s] %(message)s",
+    )
+    main()
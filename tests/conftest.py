@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+from santa_19.config import SolverConfig
+from santa_19.inputs import Day, Family, families_per_day, generate_families
+from santa_19.parameters import horizon
+from santa_19.solution import Solution
+from santa_19.solver import solve
+from santa_19.typing import FamilyID
+
+
+@dataclass(frozen=True)
+class Instance:
+    days: List[Day]
+    families: List[Family]
+    family_index: Dict[FamilyID, Family]
+
+
+def _instance(seed: int, n_families: int = 1000, n_days: int = 20) -> Instance:
+    days = horizon(n_days)
+    families = generate_families(n_families, days, seed=seed)
+    return Instance(days, families, {f.id: f for f in families})
+
+
+def _heuristic_solution(instance: Instance, **config: Any) -> Solution:
+    return solve(
+        instance.families,
+        families_per_day(instance.families, instance.days),
+        instance.family_index,
+        instance.days,
+        SolverConfig(use_mip=False, **config),
+    )
+
+
+@pytest.fixture
+def make_instance() -> Callable[..., Instance]:
+    # A generated instance small enough to solve in well under a second.
+    return _instance
+
+
+@pytest.fixture
+def heuristic_solution() -> Callable[..., Solution]:
+    # Solves an instance without the MIP; keyword arguments override the
+    # rest of the SolverConfig.
+    return _heuristic_solution
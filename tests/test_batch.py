@@ -0,0 +1,72 @@
+import csv
+
+from santa_19.batch import BatchJob, read_state, run_batch
+from santa_19.inputs import write_families
+
+
+def _jobs(tmp_path):
+    return [
+        BatchJob(
+            name=name,
+            data=str(tmp_path / f"{name}.csv"),
+            config={"use_mip": False},
+            days=20,
+        )
+        for name in ("first", "second")
+    ]
+
+
+def test_run_batch_skips_finished_and_retries_failed_jobs(
+    tmp_path, make_instance
+):
+    instance = make_instance(seed=5)
+    output_dir = tmp_path / "outputs"
+    jobs = _jobs(tmp_path)
+    # The second job's data is missing on the first run.
+    write_families(tmp_path / "first.csv", instance.families)
+
+    results = run_batch(jobs, output_dir, workers=1)
+    assert [(r.name, r.status) for r in results] == [
+        ("first", "done"),
+        ("second", "failed"),
+    ]
+
+    write_families(tmp_path / "second.csv", instance.families)
+    results = run_batch(jobs, output_dir, workers=1)
+
+    assert [(r.name, r.status) for r in results] == [
+        ("first", "done"),
+        ("second", "done"),
+    ]
+    state_lines = (output_dir / "state.jsonl").read_text().splitlines()
+    # Jobs finishing within one poll are recorded in any order.
+    assert len(state_lines) == 3
+    assert sum('"first"' in line for line in state_lines) == 1
+    with (output_dir / "summary.csv").open() as rfile:
+        summary = list(csv.DictReader(rfile))
+    assert [(row["name"], row["status"]) for row in summary] == [
+        ("first", "done"),
+        ("second", "done"),
+    ]
+    assert all(float(row["total_cost"]) > 0 for row in summary)
+
+
+def test_read_state_drops_a_truncated_last_line(tmp_path, make_instance):
+    instance = make_instance(seed=5)
+    output_dir = tmp_path / "outputs"
+    jobs = _jobs(tmp_path)
+    for job in jobs:
+        write_families(tmp_path / f"{job.name}.csv", instance.families)
+    run_batch(jobs[:1], output_dir, workers=1)
+    state_file = output_dir / "state.jsonl"
+    with state_file.open("at") as wfile:
+        wfile.write('{"name": "second", "da')
+
+    assert list(read_state(state_file)) == ["first"]
+    results = run_batch(jobs, output_dir, workers=1)
+
+    assert [(r.name, r.status) for r in results] == [
+        ("first", "done"),
+        ("second", "done"),
+    ]
+    assert list(read_state(state_file)) == ["first", "second"]
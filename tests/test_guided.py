@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from santa_19.guided import DayCosts
+from santa_19.result import evaluate
+from santa_19.solution import Solution
+
+
+def test_day_costs_total_matches_evaluate_after_moves(
+    make_instance, heuristic_solution
+):
+    instance = make_instance(seed=4)
+    days, family_index = instance.days, instance.family_index
+    solution = heuristic_solution(instance, max_improvement_passes=0)
+    day_costs = DayCosts(
+        solution.assignments, solution.daily_occupancy, family_index, days
+    )
+    rng = random.Random(0)
+
+    applied = 0
+    for _ in range(500):
+        family = rng.choice(instance.families)
+        day = rng.choice(family.choices)
+        if day == day_costs.assignments[family.id] or not (
+            day_costs.is_feasible_move(family, day)
+        ):
+            continue
+        total = day_costs.total()
+        delta = day_costs.move_delta(family, day)
+        day_costs.apply(family, day)
+        applied += 1
+
+        moved = Solution.from_assignments(
+            day_costs.assignments, days, family_index
+        )
+        cost = evaluate(moved, family_index, days).total_cost()
+        assert day_costs.total() == pytest.approx(cost, abs=1e-6)
+        assert day_costs.total() - total == pytest.approx(delta, abs=1e-6)
+    assert applied > 0
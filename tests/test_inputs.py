@@ -0,0 +1,9 @@
+from santa_19.inputs import Family, choice
+
+
+def test_unlisted_day_ranks_after_every_choice():
+    family = Family.parse([str(x) for x in [7, *range(1, 13), 4]])
+
+    assert len(family.choices) == 12
+    assert choice(family.choice_index, 11) == 10
+    assert choice(family.choice_index, 13) == 12
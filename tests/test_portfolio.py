@@ -0,0 +1,70 @@
+import time
+
+from santa_19.incumbent import SharedIncumbent
+from santa_19.portfolio import run_portfolio
+from santa_19.result import evaluate
+from santa_19.solution import is_feasible
+
+
+def test_shared_incumbent_keeps_the_best_solution(
+    make_instance, heuristic_solution
+):
+    instance = make_instance(seed=6, n_families=200)
+    days, family_index = instance.days, instance.family_index
+    worse = heuristic_solution(instance, max_improvement_passes=0)
+    better = heuristic_solution(instance)
+    worse_cost = evaluate(worse, family_index, days).total_cost()
+    better_cost = evaluate(better, family_index, days).total_cost()
+    shared = SharedIncumbent(list(family_index))
+
+    assert shared.best() is None
+    assert shared.offer(better.assignments, better_cost, "guided")
+    assert not shared.offer(worse.assignments, worse_cost, "naive")
+
+    solution, cost = shared.exchange(
+        worse, worse_cost, "naive", family_index, days
+    )
+    assert cost == better_cost
+    assert solution.assignments == better.assignments
+    assert shared.engine() == "guided"
+    assert not shared.stopped()
+    shared.stop()
+    assert shared.stopped()
+
+
+def test_portfolio_is_no_worse_than_a_single_engine(
+    make_instance, heuristic_solution
+):
+    instance = make_instance(seed=6)
+    days, family_index = instance.days, instance.family_index
+    single = evaluate(
+        heuristic_solution(instance), family_index, days
+    ).total_cost()
+
+    result = run_portfolio(
+        instance.families, days, engines=("naive", "batch"), time_limit=3
+    )
+
+    assert result.solution is not None
+    assert is_feasible(result.solution, family_index)
+    assert result.cost <= single
+    assert (
+        result.cost
+        == evaluate(result.solution, family_index, days).total_cost()
+    )
+
+
+def test_portfolio_target_stops_all_engines(make_instance):
+    instance = make_instance(seed=6)
+
+    start = time.perf_counter()
+    result = run_portfolio(
+        instance.families,
+        instance.days,
+        engines=("naive", "batch"),
+        time_limit=60,
+        target=1e9,
+    )
+
+    assert time.perf_counter() - start < 30
+    assert result.cost <= 1e9
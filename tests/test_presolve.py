@@ -0,0 +1,26 @@
+from santa_19.costs import accounting_cost
+from santa_19.presolve import presolve
+from santa_19.result import evaluate
+
+
+def test_presolve_keeps_the_incumbent(make_instance, heuristic_solution):
+    instance = make_instance(seed=3)
+    incumbent = heuristic_solution(instance)
+    cost = evaluate(
+        incumbent, instance.family_index, instance.days
+    ).total_cost()
+
+    domains = presolve(instance.families, instance.days, cost)
+
+    assert domains.lower_bound <= cost
+    for family_id, day in incumbent.assignments.items():
+        assert day in domains.choices[family_id]
+    occupancy = incumbent.daily_occupancy
+    for day in instance.days:
+        assert occupancy[day] in domains.occupancies[day]
+        assert (
+            accounting_cost(
+                occupancy[day], occupancy.get(day + 1, occupancy[day])
+            )
+            <= domains.pair_budget[day]
+        )
@@ -0,0 +1,76 @@
+from dataclasses import replace
+
+from santa_19.inputs import diff_families, families_per_day
+from santa_19.result import evaluate
+from santa_19.solution import Solution, is_feasible
+from santa_19.solver import reoptimize
+
+
+def _reversed_choices(families, n: int):
+    changed = []
+    for family in families:
+        if family.id < n:
+            choices = list(reversed(family.choices))
+            family = replace(
+                family,
+                choices=choices,
+                choice_index={c: i for i, c in enumerate(choices)},
+            )
+        changed.append(family)
+    return changed
+
+
+def test_reoptimize_searches_families_with_changed_choices(
+    make_instance, heuristic_solution
+):
+    instance = make_instance(seed=1)
+    days = instance.days
+    base = heuristic_solution(instance)
+    families = _reversed_choices(instance.families, 20)
+    family_index = {f.id: f for f in families}
+
+    solution = reoptimize(
+        base,
+        instance.family_index,
+        diff_families(instance.family_index, family_index),
+        families,
+        families_per_day(families, days),
+        family_index,
+        days,
+    )
+
+    # Every changed family's day is still among its choices, so nothing
+    # but the local search can move them off their now worst choice.
+    unchanged = Solution.from_assignments(base.assignments, days, family_index)
+    assert is_feasible(solution, family_index)
+    assert (
+        evaluate(solution, family_index, days).total_cost()
+        < evaluate(unchanged, family_index, days).total_cost()
+    )
+
+
+def test_reoptimize_assigns_changed_families_missing_from_base(
+    make_instance, heuristic_solution
+):
+    instance = make_instance(seed=1)
+    days = instance.days
+    base = heuristic_solution(instance)
+    base = Solution.from_assignments(
+        {f: d for f, d in base.assignments.items() if f != 3},
+        days,
+        instance.family_index,
+    )
+    families = _reversed_choices(instance.families, 5)
+    family_index = {f.id: f for f in families}
+
+    solution = reoptimize(
+        base,
+        instance.family_index,
+        diff_families(instance.family_index, family_index),
+        families,
+        families_per_day(families, days),
+        family_index,
+        days,
+    )
+
+    assert is_feasible(solution, family_index)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from santa_19.result import evaluate
+from santa_19.solution import Solution
+from santa_19.vectorized import FamilyArrays, best_moves
+
+
+def test_best_moves_deltas_match_evaluate(make_instance, heuristic_solution):
+    instance = make_instance(seed=2)
+    days, family_index = instance.days, instance.family_index
+    # Without improvement passes the constructed solution leaves plenty of
+    # improving moves.
+    solution = heuristic_solution(instance, max_improvement_passes=0)
+    arrays = FamilyArrays.from_families(instance.families)
+    assigned = np.array([solution.assignments[f] for f in arrays.ids])
+    occupancy = np.zeros(max(days) + 1, dtype=int)
+    np.add.at(occupancy, assigned, arrays.sizes)
+    cost = evaluate(solution, family_index, days).total_cost()
+
+    moves = best_moves(arrays, assigned, occupancy)
+
+    assert len(moves.rows) > 0
+    for row, to_day, delta in zip(moves.rows, moves.to_days, moves.deltas):
+        assignments = dict(solution.assignments)
+        assignments[int(arrays.ids[row])] = int(to_day)
+        moved = Solution.from_assignments(assignments, days, family_index)
+        assert evaluate(moved, family_index, days).total_cost() - cost == (
+            pytest.approx(delta, abs=1e-6)
+        )